@@ -0,0 +1,175 @@
+"""
+End-to-end throughput check for /api/chat.
+
+Drives the Flask app in-process through its test client, so every request
+goes through request parsing, ChromaDB retrieval, prompt building, generation
+and classroom/meeting tag injection. By default generation uses the
+deterministic fake pipeline from benchmark_chat_scheduler; pass --real to use
+the model at OPENVINO_MODEL_DIR instead. Prints p50/p95 latency and
+requests/sec for each concurrency level.
+
+    python benchmark_chat.py [--real] [--stream] [--levels 1,4,16]
+                             [--requests-per-user 4] [--token-latency-ms 2]
+                             [--tokens 64] [--seed-docs 50] [--cache]
+
+The app runs against a throwaway SQLite database and ChromaDB directory. The
+response cache is disabled unless --cache is given, since repeated benchmark
+questions would otherwise be served from it.
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'src'))
+
+TOPICS = ["science", "music", "history", "football", "robots", "poetry", "space", "cooking"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def load_app(args):
+    """Import main against a scratch database and ChromaDB directory."""
+    if os.getenv('OPENVINO_MODEL_DIR'):
+        os.environ['OPENVINO_MODEL_DIR'] = os.path.abspath(os.environ['OPENVINO_MODEL_DIR'])
+    workdir = tempfile.mkdtemp(prefix='penpals-bench-')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['CHAT_CACHE_ENABLED'] = 'true' if args.cache else 'false'
+    os.chdir(workdir)
+
+    import openvino_chat
+    from benchmark_chat_scheduler import FakeBatchingPipeline
+
+    if not args.real:
+        openvino_chat._PIPELINE = FakeBatchingPipeline(args.token_latency_ms / 1000.0, args.tokens)
+        openvino_chat.ov_genai = openvino_chat.ov_genai or object()
+
+    import main
+    return main
+
+
+def seed_documents(app_module, count):
+    if count <= 0:
+        return
+    documents, metadatas, ids = [], [], []
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)]
+        if i % 4 == 3:
+            documents.append(f"Public meeting about {topic} projects for classrooms, session {i}")
+            metadatas.append({"source": "meeting", "visibility": "public", "meeting_id": str(i)})
+            ids.append(f"bench_meeting_{i}")
+        else:
+            documents.append(f"Our class loves {topic} and wants pen pals to share {topic} projects with")
+            metadatas.append({"source": "post", "classroom_id": str(i), "post_id": str(i)})
+            ids.append(f"bench_post_{i}")
+    result = app_module.chroma_service.add_documents(documents, metadatas=metadatas, ids=ids)
+    if result.get('status') != 'success':
+        print(f"Warning: could not seed ChromaDB ({result.get('message')}); retrieval will return nothing")
+
+
+def run_request(client, payload, stream):
+    """Return (latency, ttft or None, ok)."""
+    started = time.perf_counter()
+    if not stream:
+        response = client.post('/api/chat', json=payload)
+        ok = response.status_code == 200 and response.json.get('status') == 'success'
+        return time.perf_counter() - started, None, ok
+
+    response = client.post('/api/chat/stream', json=payload, buffered=False)
+    ttft = None
+    body = []
+    for chunk in response.response:
+        chunk = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        if ttft is None and 'event: token' in chunk:
+            ttft = time.perf_counter() - started
+        body.append(chunk)
+    response.close()
+    ok = 'event: done' in ''.join(body)
+    return time.perf_counter() - started, ttft, ok
+
+
+def run_level(app_module, users, requests_per_user, stream):
+    latencies, ttfts, failures = [], [], []
+    lock = threading.Lock()
+
+    def user_loop(user_index):
+        client = app_module.application.test_client()
+        for i in range(requests_per_user):
+            topic = TOPICS[(user_index + i) % len(TOPICS)]
+            payload = {"message": f"find a class interested in {topic} (user {user_index}, request {i})"}
+            latency, ttft, ok = run_request(client, payload, stream)
+            with lock:
+                latencies.append(latency)
+                if ttft is not None:
+                    ttfts.append(ttft)
+                if not ok:
+                    failures.append(1)
+
+    threads = [threading.Thread(target=user_loop, args=(i,)) for i in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = users * requests_per_user
+    line = (f"{users:>3} users | {total:>4} requests | {total / elapsed:7.2f} req/s | "
+            f"p50 {percentile(latencies, 0.5) * 1000:8.1f} ms | p95 {percentile(latencies, 0.95) * 1000:8.1f} ms")
+    if ttfts:
+        line += f" | ttft p50 {percentile(ttfts, 0.5) * 1000:7.1f} ms"
+    if failures:
+        line += f" | {len(failures)} failed"
+    print(line)
+
+
+def print_breakdown(app_module):
+    histograms = app_module.metrics.REGISTRY.snapshot()
+    print("\nServer-side p50 across all levels:")
+    for name in ("chat_retrieval_seconds", "chat_queue_wait_seconds", "chat_ttft_seconds",
+                 "chat_generation_seconds", "chat_prompt_tokens", "chat_decode_tokens_per_second"):
+        snapshot = histograms.get(name)
+        if not snapshot or not snapshot["count"]:
+            continue
+        value = snapshot["p50"]
+        if name.endswith("_seconds"):
+            print(f"  {name:<32} {value * 1000:9.1f} ms")
+        else:
+            print(f"  {name:<32} {value:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--real', action='store_true', help='use the OpenVINO model instead of the fake pipeline')
+    parser.add_argument('--stream', action='store_true', help='benchmark /api/chat/stream instead of /api/chat')
+    parser.add_argument('--levels', default='1,4,16', help='comma-separated concurrent user counts')
+    parser.add_argument('--requests-per-user', type=int, default=4)
+    parser.add_argument('--token-latency-ms', type=float, default=2.0, help='fake pipeline cost per token')
+    parser.add_argument('--tokens', type=int, default=64, help='tokens generated per fake reply')
+    parser.add_argument('--seed-docs', type=int, default=50, help='synthetic documents to index first')
+    parser.add_argument('--cache', action='store_true', help='leave the chat response cache enabled')
+    args = parser.parse_args()
+
+    app_module = load_app(args)
+    seed_documents(app_module, args.seed_docs)
+
+    import openvino_chat
+    pipeline = f"OpenVINO {openvino_chat.DEFAULT_MODEL_DIR}" if args.real else (
+        f"fake ({args.tokens} tokens @ {args.token_latency_ms} ms)")
+    print(f"Endpoint: {'/api/chat/stream' if args.stream else '/api/chat'} | pipeline: {pipeline}")
+    for level in [int(x) for x in args.levels.split(',') if x.strip()]:
+        run_level(app_module, level, args.requests_per_user, args.stream)
+    print_breakdown(app_module)
+
+
+if __name__ == '__main__':
+    main()
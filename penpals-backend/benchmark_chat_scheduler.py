@@ -0,0 +1,109 @@
+"""
+Throughput check for the chat request scheduler in openvino_chat.
+
+Runs N concurrent simulated users against ChatScheduler and prints
+requests/sec at 1, 4 and 16 users. By default a fake pipeline is used whose
+batched generate() costs a little more than a single one (as on CPU); pass
+--real to use the model at OPENVINO_MODEL_DIR instead.
+
+    python benchmark_chat_scheduler.py [--real] [--requests-per-user 4]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import openvino_chat  # noqa: E402
+
+PROMPT = "You are the PenPals assistant.\n\nUser: find a class interested in science\nAssistant:"
+
+
+class _FakeConfig:
+    max_new_tokens = 64
+    temperature = 0.7
+    top_p = 0.9
+
+
+REPLY_WORDS = ["Sure", ",", " here", " are", " some", " classes", " that", " like", " science", "."]
+
+
+class FakeBatchingPipeline:
+    """
+    Deterministic stand-in for ov_genai.LLMPipeline. Sleeps token_latency_s per
+    generated token (capped by config.max_new_tokens); each extra prompt in a
+    batch adds BATCH_OVERHEAD of the cost. Streams words when given a streamer.
+    """
+
+    BATCH_OVERHEAD = 0.15
+
+    def __init__(self, token_latency_s: float = 0.002, tokens: int = 64):
+        self.token_latency_s = token_latency_s
+        self.tokens = tokens
+
+    def get_generation_config(self):
+        return _FakeConfig()
+
+    def generate(self, prompt, config, streamer=None):
+        batch = len(prompt) if isinstance(prompt, list) else 1
+        tokens = min(self.tokens, getattr(config, "max_new_tokens", self.tokens) or self.tokens)
+        per_token = self.token_latency_s * (1 + self.BATCH_OVERHEAD * (batch - 1))
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(tokens)]
+        if streamer is not None:
+            for word in words:
+                time.sleep(per_token)
+                if streamer(word):
+                    break
+        else:
+            time.sleep(per_token * tokens)
+        text = "".join(words)
+        if isinstance(prompt, list):
+            return type("DecodedResults", (), {"texts": [text] * batch})()
+        return text
+
+
+def run_level(users: int, requests_per_user: int):
+    scheduler = openvino_chat.ChatScheduler(
+        max_batch_size=openvino_chat.BATCH_MAX_SIZE,
+        batch_wait_seconds=openvino_chat.BATCH_WAIT_MS / 1000.0,
+    )
+
+    def user_loop(user_index: int):
+        for _ in range(requests_per_user):
+            scheduler.submit(PROMPT, client_key=f"user-{user_index}").wait()
+
+    threads = [threading.Thread(target=user_loop, args=(i,)) for i in range(users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = scheduler.stats()
+    total = users * requests_per_user
+    print(f"{users:>3} users | {total:>4} requests | {elapsed:7.2f}s | "
+          f"{total / elapsed:7.2f} req/s | avg batch {stats['avg_batch_size']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--real', action='store_true', help='use the OpenVINO model instead of the fake pipeline')
+    parser.add_argument('--requests-per-user', type=int, default=4)
+    parser.add_argument('--levels', default='1,4,16', help='comma-separated concurrent user counts')
+    args = parser.parse_args()
+
+    if not args.real:
+        openvino_chat._PIPELINE = FakeBatchingPipeline()
+        openvino_chat.ov_genai = openvino_chat.ov_genai or object()
+
+    print(f"Pipeline: {'OpenVINO ' + openvino_chat.DEFAULT_MODEL_DIR if args.real else 'fake'} | "
+          f"max batch {openvino_chat.BATCH_MAX_SIZE}")
+    for level in [int(x) for x in args.levels.split(',') if x.strip()]:
+        run_level(level, args.requests_per_user)
+
+
+if __name__ == '__main__':
+    main()
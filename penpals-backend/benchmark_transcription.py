@@ -0,0 +1,114 @@
+"""
+Compare the old temp-file audio path with in-memory decoding for
+/api/chat/transcribe.
+
+  temp file  write the upload to a NamedTemporaryFile, decode it from the path
+  in memory  decode the upload bytes from a BytesIO
+  prepared   in-memory decode with the duration cap and silence trim
+             (audio_prep.prepare_audio, what the endpoint does now)
+
+By default only decoding is timed. Pass --transcribe to also run the
+faster-whisper model (FASTER_WHISPER_MODEL_SIZE, default base) on both paths.
+Without --audio a 10 second synthetic WAV clip is used.
+
+    python benchmark_transcription.py [--audio clip.webm] [--repeat 20] [--transcribe]
+"""
+import argparse
+import io
+import math
+import os
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import wave
+
+from faster_whisper import WhisperModel, decode_audio
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+import audio_prep
+
+
+def synthetic_wav(seconds: float = 10.0, sample_rate: int = 44100) -> bytes:
+    """A stereo 44.1 kHz tone, so decoding has to downmix and resample like a real upload."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        frames = bytearray()
+        for i in range(int(seconds * sample_rate)):
+            sample = int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate))
+            frames += struct.pack('<hh', sample, sample)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def decode_via_temp_file(audio_bytes: bytes, suffix: str):
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            temp_file.write(audio_bytes)
+            temp_path = temp_file.name
+        return decode_audio(temp_path)
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+def decode_in_memory(audio_bytes: bytes, suffix: str):
+    return decode_audio(io.BytesIO(audio_bytes))
+
+
+def decode_prepared(audio_bytes: bytes, suffix: str):
+    return audio_prep.prepare_audio(audio_bytes).samples
+
+
+def time_path(name, fn, audio_bytes, suffix, repeat, model=None):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        audio = fn(audio_bytes, suffix)
+        if model is not None:
+            segments, _ = model.transcribe(audio, beam_size=1, vad_filter=True)
+            list(segments)
+        timings.append(time.perf_counter() - started)
+    print(f"{name:<10} | mean {statistics.mean(timings) * 1000:8.1f} ms | "
+          f"min {min(timings) * 1000:8.1f} ms | max {max(timings) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audio', help='audio file to use instead of the synthetic clip')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--transcribe', action='store_true', help='include faster-whisper transcription')
+    args = parser.parse_args()
+
+    if args.audio:
+        with open(args.audio, 'rb') as audio_file:
+            audio_bytes = audio_file.read()
+        suffix = os.path.splitext(args.audio)[1] or '.webm'
+    else:
+        audio_bytes = synthetic_wav()
+        suffix = '.wav'
+
+    model = None
+    if args.transcribe:
+        model = WhisperModel(
+            os.getenv('FASTER_WHISPER_MODEL_SIZE', 'base'),
+            device=os.getenv('FASTER_WHISPER_DEVICE', 'cpu'),
+            compute_type=os.getenv('FASTER_WHISPER_COMPUTE_TYPE', 'int8'),
+        )
+
+    print(f"Audio: {args.audio or 'synthetic 10 s stereo WAV'} ({len(audio_bytes)} bytes) | "
+          f"{args.repeat} runs{' incl. transcription' if model else ''}")
+    # Warm the decoder and page cache once so neither path pays first-run costs
+    decode_in_memory(audio_bytes, suffix)
+    time_path("temp file", decode_via_temp_file, audio_bytes, suffix, args.repeat, model)
+    time_path("in memory", decode_in_memory, audio_bytes, suffix, args.repeat, model)
+    time_path("prepared", decode_prepared, audio_bytes, suffix, args.repeat, model)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The backend modules live flat in src/ and import each other by name
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+# test_like.py and verify_classrooms.py drive a running server by hand
+collect_ignore = ["test_like.py", "verify_classrooms.py"]
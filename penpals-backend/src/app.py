@@ -21,13 +21,14 @@ def check_port_available(port, host='127.0.0.1'):
 def main():
     """Main application entry point"""
     # Import the Flask application
-    from main import application
+    from main import application, start_model_warmup
     
     # Determine port - default to 5001 for consistency with frontend
     default_port = 5001
     port = int(os.environ.get('PORT', default_port))
     host = os.environ.get('HOST', '0.0.0.0')
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
+    warmup = '--warmup' in sys.argv or os.environ.get('PENPALS_WARMUP', 'False').lower() == 'true'
     
     # Check if port is available (only if using default)
     if port == default_port and not check_port_available(port, '127.0.0.1'):
@@ -41,6 +42,7 @@ def main():
     print(f"Host: {host}")
     print(f"Port: {port}")
     print(f"Debug mode: {debug}")
+    print(f"Model warm-up: {warmup}")
     print(f"\n{'='*60}")
     print(f"  Backend API available at: http://127.0.0.1:{port}/api")
     if port != default_port:
@@ -48,6 +50,11 @@ def main():
         print(f"  Update frontend settings to connect to this port")
     print(f"{'='*60}\n")
     
+    # With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if warmup and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        start_model_warmup()
+        print("Warming up models in the background; see /api/health/ready")
+
     try:
         application.run(host=host, port=port, debug=debug)
     except KeyboardInterrupt:
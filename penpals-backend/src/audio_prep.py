@@ -0,0 +1,180 @@
+"""
+Cheap pre-pass over transcription uploads before Whisper runs.
+
+The byte-size limit on uploads does not bound decode cost: a small, highly
+compressed file can hold many minutes of audio. Here the container duration
+is probed first, decoding stops as soon as the cap is crossed, and leading
+and trailing silence is cut with a frame-energy check so the model only sees
+the part of the recording that has sound in it. Downmixing to mono and
+resampling to 16 kHz happen once, in the same PyAV pass.
+"""
+
+import importlib
+import io
+import os
+from typing import Optional
+
+SAMPLING_RATE = 16000
+TRANSCRIBE_MAX_AUDIO_SECONDS = float(os.getenv("TRANSCRIBE_MAX_AUDIO_SECONDS", "600"))
+TRANSCRIBE_TRIM_SILENCE = os.getenv("TRANSCRIBE_TRIM_SILENCE", "true").lower() == "true"
+TRANSCRIBE_SILENCE_THRESHOLD_DB = float(os.getenv("TRANSCRIBE_SILENCE_THRESHOLD_DB", "-45"))
+TRANSCRIBE_SILENCE_PAD_SECONDS = float(os.getenv("TRANSCRIBE_SILENCE_PAD_SECONDS", "0.3"))
+SILENCE_FRAME_SECONDS = 0.03
+
+
+class AudioTooLongError(ValueError):
+    """Raised when an upload is longer than TRANSCRIBE_MAX_AUDIO_SECONDS."""
+
+
+class PreparedAudio:
+    def __init__(self, samples, offset_seconds: float, source_seconds: float):
+        self.samples = samples
+        # Start of samples within the original recording, for shifting timestamps back
+        self.offset_seconds = offset_seconds
+        self.source_seconds = source_seconds
+
+    @property
+    def seconds(self) -> float:
+        return self.samples.size / SAMPLING_RATE
+
+    @property
+    def trimmed_seconds(self) -> float:
+        return max(0.0, self.source_seconds - self.seconds)
+
+
+def _too_long(seconds: float, max_seconds: float) -> AudioTooLongError:
+    return AudioTooLongError(
+        f"Audio is too long ({seconds:.1f}s). Max duration is {max_seconds:g} seconds"
+    )
+
+
+def _probe_duration(container) -> Optional[float]:
+    """Duration from the container header, or None (common for MediaRecorder WebM)."""
+    if container.duration:
+        return container.duration / 1_000_000
+    stream = container.streams.audio[0]
+    if stream.duration and stream.time_base:
+        return float(stream.duration * stream.time_base)
+    return None
+
+
+def decode_pcm(audio_bytes: bytes, sampling_rate: int = SAMPLING_RATE,
+               max_seconds: Optional[float] = None):
+    """
+    Decode an upload to mono float32 PCM at sampling_rate in memory.
+
+    Args:
+        audio_bytes: encoded upload
+        sampling_rate: output rate
+        max_seconds: reject (without finishing the decode) past this duration
+
+    Returns:
+        numpy float32 array
+
+    Raises AudioTooLongError past max_seconds and ValueError for anything
+    that is not decodable audio.
+    """
+    av = importlib.import_module("av")
+    np = importlib.import_module("numpy")
+    max_samples = int(max_seconds * sampling_rate) if max_seconds else None
+
+    try:
+        container = av.open(io.BytesIO(audio_bytes), mode="r", metadata_errors="ignore")
+    except Exception as e:
+        raise ValueError(f"Could not decode uploaded audio: {e}")
+
+    chunks, total = [], 0
+    with container:
+        if not container.streams.audio:
+            raise ValueError("Uploaded file has no audio track")
+        duration = _probe_duration(container)
+        if max_seconds and duration and duration > max_seconds:
+            raise _too_long(duration, max_seconds)
+
+        resampler = av.audio.resampler.AudioResampler(format="s16", layout="mono", rate=sampling_rate)
+        stream = container.streams.audio[0]
+        bad_packets = 0
+
+        def resample(frame):
+            nonlocal total
+            # A None frame flushes the resampler
+            for resampled in resampler.resample(frame):
+                chunk = resampled.to_ndarray().reshape(-1)
+                chunks.append(chunk)
+                total += chunk.size
+            if max_samples is not None and total > max_samples:
+                raise _too_long(total / sampling_rate, max_seconds)
+
+        try:
+            # Decode packet by packet so a corrupt packet only loses itself;
+            # demux() ends with an empty packet that flushes the decoder
+            for packet in container.demux(stream):
+                try:
+                    frames = packet.decode()
+                except av.error.InvalidDataError:
+                    bad_packets += 1
+                    continue
+                for frame in frames:
+                    frame.pts = None
+                    resample(frame)
+            resample(None)
+        except AudioTooLongError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Could not decode uploaded audio: {e}")
+
+    if bad_packets:
+        if not chunks:
+            raise ValueError("Could not decode uploaded audio: no valid audio packets")
+        print(f"Skipped {bad_packets} undecodable audio packet(s) in upload")
+
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks).astype(np.float32) / 32768.0
+
+
+def trim_silence(samples, sampling_rate: int = SAMPLING_RATE,
+                 threshold_db: float = TRANSCRIBE_SILENCE_THRESHOLD_DB,
+                 pad_seconds: float = TRANSCRIBE_SILENCE_PAD_SECONDS):
+    """
+    Cut leading and trailing frames whose RMS level is below threshold_db
+    (dBFS), keeping pad_seconds around the voiced region.
+
+    Returns (trimmed samples, start offset in seconds). Audio with no frame
+    above the threshold comes back empty.
+    """
+    np = importlib.import_module("numpy")
+    frame_size = max(1, int(sampling_rate * SILENCE_FRAME_SECONDS))
+    frame_count = samples.size // frame_size
+    if frame_count == 0:
+        return samples, 0.0
+
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    voiced = np.flatnonzero(rms > 10 ** (threshold_db / 20))
+    if voiced.size == 0:
+        return samples[:0], 0.0
+
+    pad = int(pad_seconds * sampling_rate)
+    start = max(0, int(voiced[0]) * frame_size - pad)
+    end = min(samples.size, (int(voiced[-1]) + 1) * frame_size + pad)
+    return samples[start:end], start / sampling_rate
+
+
+def prepare_audio(audio_bytes: bytes, max_seconds: Optional[float] = TRANSCRIBE_MAX_AUDIO_SECONDS,
+                  trim: bool = TRANSCRIBE_TRIM_SILENCE) -> PreparedAudio:
+    samples = decode_pcm(audio_bytes, SAMPLING_RATE, max_seconds=max_seconds)
+    source_seconds = samples.size / SAMPLING_RATE
+    offset_seconds = 0.0
+    if trim:
+        samples, offset_seconds = trim_silence(samples, SAMPLING_RATE)
+    return PreparedAudio(samples, offset_seconds, source_seconds)
+
+
+def cache_params() -> dict:
+    """Settings that change what the model is fed, for the transcript cache key."""
+    return {
+        "trim_silence": TRANSCRIBE_TRIM_SILENCE,
+        "silence_threshold_db": TRANSCRIBE_SILENCE_THRESHOLD_DB,
+        "silence_pad_seconds": TRANSCRIBE_SILENCE_PAD_SECONDS,
+    }
@@ -1,27 +1,179 @@
 """ChromaDB vector storage"""
-from typing import List, Dict, Optional, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Any, Tuple
+import hashlib
+import os
+import threading
 import uuid
 import chromadb
 from chromadb.api.types import Metadata
+from chromadb.utils import embedding_functions
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("CHROMA_QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+# Metadata key holding a hash of the document text, so upserts can tell
+# whether a document needs re-embedding
+CONTENT_HASH_KEY = "content_hash"
+
+# Process-wide registry: one client per persist directory, one embedding
+# function and one query thread pool, shared by every collection service
+_REGISTRY_LOCK = threading.RLock()
+_CLIENTS: Dict[str, Any] = {}
+_SERVICES: Dict[Tuple[str, str], "ChromaDBService"] = {}
+_EMBEDDING_FUNCTION: Any = None
+_QUERY_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+class SharedDefaultEmbeddingFunction(embedding_functions.DefaultEmbeddingFunction):
+    """
+    The default (all-MiniLM-L6-v2 ONNX) embedding function, holding on to a
+    single model instance. chromadb's DefaultEmbeddingFunction builds a new
+    ONNX model on every call; this keeps the name "default" so existing
+    collections accept it.
+
+    Because it still counts as "default", chromadb swaps in the collection's
+    own (per-call) default function whenever it embeds documents itself, so
+    ChromaDBService embeds with this instance and passes embeddings= on every
+    add, upsert and update.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self._model: Any = None
+        self._model_lock = threading.Lock()
+
+    def __call__(self, input: Any) -> Any:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+                    self._model = ONNXMiniLM_L6_V2()
+        return self._model(input)
+
+
+def get_client(persist_directory: str = CHROMA_PERSIST_DIRECTORY) -> Any:
+    """Return the shared PersistentClient for persist_directory, creating it once."""
+    key = os.path.abspath(persist_directory)
+    with _REGISTRY_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = chromadb.PersistentClient(path=persist_directory)
+            _CLIENTS[key] = client
+        return client
+
+
+def get_embedding_function() -> Any:
+    """Return the process-wide embedding function, loading it once."""
+    global _EMBEDDING_FUNCTION
+    with _REGISTRY_LOCK:
+        if _EMBEDDING_FUNCTION is None:
+            _EMBEDDING_FUNCTION = SharedDefaultEmbeddingFunction()
+        return _EMBEDDING_FUNCTION
+
+
+def _get_query_executor() -> ThreadPoolExecutor:
+    global _QUERY_EXECUTOR
+    with _REGISTRY_LOCK:
+        if _QUERY_EXECUTOR is None:
+            _QUERY_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chroma-query")
+        return _QUERY_EXECUTOR
+
+
+def get_chroma_service(collection_name: str,
+                       persist_directory: str = CHROMA_PERSIST_DIRECTORY) -> "ChromaDBService":
+    """
+    Return the shared ChromaDBService for a collection
+    
+    Args:
+        collection_name: Name of the collection
+        persist_directory: Directory to persist ChromaDB data
+    
+    Returns:
+        The same service instance for every caller asking for this collection
+    """
+    key = (os.path.abspath(persist_directory), collection_name)
+    with _REGISTRY_LOCK:
+        service = _SERVICES.get(key)
+        if service is None:
+            service = ChromaDBService(persist_directory=persist_directory, collection_name=collection_name)
+            _SERVICES[key] = service
+        return service
+
+
+def get_registry_stats() -> Dict[str, Any]:
+    """Clients and collections currently held by the registry."""
+    with _REGISTRY_LOCK:
+        return {
+            "clients": len(_CLIENTS),
+            "collections": sorted(name for _, name in _SERVICES),
+            "embedding_function_loaded": _EMBEDDING_FUNCTION is not None,
+        }
 
 
 class ChromaDBService:
     """Service for managing document embeddings with ChromaDB"""
-    def __init__(self, persist_directory: str = "./chroma_db", collection_name: str = "documents"):
+    def __init__(self, persist_directory: str = CHROMA_PERSIST_DIRECTORY, collection_name: str = "documents",
+                 embedding_cache_size: int = QUERY_EMBEDDING_CACHE_SIZE):
         """
         Initialize ChromaDB client and collection
         
+        The client, embedding function and query thread pool come from the
+        process-wide registry; prefer get_chroma_service() so each collection
+        also has a single service instance.
+        
         Args:
             persist_directory: Directory to persist ChromaDB data
             collection_name: Name of the collection to use
+            embedding_cache_size: Max number of query embeddings kept in the LRU cache
         """
-        self.client: Any = chromadb.PersistentClient(path=persist_directory)
+        self.client: Any = get_client(persist_directory)
         self.collection_name: str = collection_name
-        # Get or create collection with default embedding function
+        # Keep a handle on the (default) embedding function so queries can be
+        # embedded once and reused across several searches
+        self.embedding_function: Any = get_embedding_function()
         self.collection: Any = self.client.get_or_create_collection(
             name=collection_name,
-            metadata={"hnsw:space": "cosine"}
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=self.embedding_function
         )
+        self._query_executor = _get_query_executor()
+        self._embedding_cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._embedding_cache_size = max(0, embedding_cache_size)
+        self._embedding_cache_lock = threading.Lock()
+        self._embedding_cache_hits = 0
+        self._embedding_cache_misses = 0
+        self._write_listeners: List[Callable[[List[str]], None]] = []
+
+    def add_write_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """
+        Register a callback invoked with the affected IDs after every successful
+        add, update or delete (used to invalidate caches built on query results).
+        """
+        self._write_listeners.append(listener)
+
+    def _notify_write(self, ids: List[str]) -> None:
+        for listener in self._write_listeners:
+            try:
+                listener(list(ids))
+            except Exception as e:
+                print(f"ChromaDB write listener error: {e}")
+
+    @staticmethod
+    def content_hash(document: str) -> str:
+        return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+    def _with_content_hashes(self, documents: List[str],
+                             metadatas: Optional[List[Metadata]]) -> List[Metadata]:
+        if metadatas is None:
+            metadatas = [{} for _ in documents]
+        return [
+            {**(metadata or {}), CONTENT_HASH_KEY: self.content_hash(document)}
+            for document, metadata in zip(documents, metadatas)
+        ]
+
+    def _embed(self, documents: List[str]) -> List[Any]:
+        """Embed documents with the shared model instance."""
+        return self.embedding_function(documents)
 
     def add_documents(self, documents: List[str], metadatas: Optional[List[Metadata]] = None,
                       ids: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -40,15 +192,16 @@ class ChromaDBService:
             # Generate IDs if not provided
             if ids is None:
                 ids = [str(uuid.uuid4()) for _ in documents]
-            # Prepare metadatas if not provided
-            if metadatas is None:
-                metadatas = [{} for _ in documents]
-            # Add to collection (ChromaDB will generate embeddings automatically)
+            # Prepare metadatas (stamped with the text hash for later upserts)
+            metadatas = self._with_content_hashes(documents, metadatas)
+            # Add to collection with embeddings from the shared model
             self.collection.add(
                 documents=documents,
+                embeddings=self._embed(documents),
                 metadatas=metadatas,
                 ids=ids
             )
+            self._notify_write(ids)
             return {
                 "status": "success",
                 "message": f"Added {len(documents)} documents",
@@ -60,6 +213,182 @@ class ChromaDBService:
                 "message": str(e)
             }
 
+    def upsert_documents(self, documents: List[str], ids: List[str],
+                         metadatas: Optional[List[Metadata]] = None,
+                         force: bool = False) -> Dict[str, Any]:
+        """
+        Insert or update documents by ID, re-embedding only what changed
+        
+        Each document's text hash is compared with the one stored in its
+        metadata: new or edited text is embedded and upserted, unchanged text
+        with new metadata gets a metadata-only update, and documents where
+        neither changed are skipped. ChromaDB merges metadata on upsert and
+        update, so stored keys missing from the new metadata are written as
+        None, which removes them.
+        
+        Args:
+            documents: List of text documents
+            ids: List of document IDs
+            metadatas: Optional list of metadata dictionaries for each document
+            force: Re-embed every document even if its text hash is unchanged
+        
+        Returns:
+            Dictionary with status, document IDs and embedded / metadata_only / unchanged counts
+        """
+        try:
+            metadatas = self._with_content_hashes(documents, metadatas)
+            existing: Any = (
+                self.collection.get(ids=ids, include=["metadatas"]) if ids
+                else {"ids": [], "metadatas": []}
+            )
+            stored = {
+                doc_id: (metadata or {})
+                for doc_id, metadata in zip(existing["ids"], existing["metadatas"] or [])
+            }
+
+            embed: Dict[str, List[Any]] = {"ids": [], "documents": [], "metadatas": []}
+            metadata_only: Dict[str, List[Any]] = {"ids": [], "metadatas": []}
+            unchanged = 0
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                previous = stored.get(doc_id)
+                removed = {key: None for key in (previous or {}) if key not in metadata}
+                if force or previous is None or previous.get(CONTENT_HASH_KEY) != metadata[CONTENT_HASH_KEY]:
+                    embed["ids"].append(doc_id)
+                    embed["documents"].append(document)
+                    embed["metadatas"].append({**metadata, **removed})
+                elif removed or any(previous.get(key) != value for key, value in metadata.items()):
+                    metadata_only["ids"].append(doc_id)
+                    metadata_only["metadatas"].append({**metadata, **removed})
+                else:
+                    unchanged += 1
+
+            if embed["ids"]:
+                self.collection.upsert(embeddings=self._embed(embed["documents"]), **embed)
+            if metadata_only["ids"]:
+                # No documents passed, so ChromaDB keeps the stored embeddings
+                self.collection.update(**metadata_only)
+            written = embed["ids"] + metadata_only["ids"]
+            if written:
+                self._notify_write(written)
+            return {
+                "status": "success",
+                "message": f"Upserted {len(written)} documents",
+                "document_ids": ids,
+                "embedded": len(embed["ids"]),
+                "metadata_only": len(metadata_only["ids"]),
+                "unchanged": unchanged
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+
+    def update_metadata(self, ids: List[str], metadatas: List[Metadata]) -> Dict[str, Any]:
+        """
+        Update document metadata without touching text or embeddings
+        
+        Args:
+            ids: List of document IDs
+            metadatas: New metadata for each document (merged into the stored metadata)
+        
+        Returns:
+            Dictionary with status
+        """
+        try:
+            self.collection.update(ids=ids, metadatas=metadatas)
+            self._notify_write(ids)
+            return {
+                "status": "success",
+                "message": f"Updated metadata for {len(ids)} documents",
+                "document_ids": ids
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+
+    def embed_query(self, query_text: str) -> List[float]:
+        """
+        Embed a query string with the collection's embedding function
+        
+        Args:
+            query_text: The text to embed
+        
+        Repeated query strings are served from a bounded LRU cache instead of
+        re-running the embedding model.
+        
+        Returns:
+            The embedding vector as a list of floats
+        """
+        with self._embedding_cache_lock:
+            cached = self._embedding_cache.get(query_text)
+            if cached is not None:
+                self._embedding_cache.move_to_end(query_text)
+                self._embedding_cache_hits += 1
+                return list(cached)
+            self._embedding_cache_misses += 1
+
+        embedding = tuple(float(value) for value in self.embedding_function([query_text])[0])
+
+        if self._embedding_cache_size > 0:
+            with self._embedding_cache_lock:
+                self._embedding_cache[query_text] = embedding
+                self._embedding_cache.move_to_end(query_text)
+                while len(self._embedding_cache) > self._embedding_cache_size:
+                    self._embedding_cache.popitem(last=False)
+        return list(embedding)
+
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters for the query embedding cache
+        
+        Returns:
+            Dictionary with cache size and counters
+        """
+        with self._embedding_cache_lock:
+            lookups = self._embedding_cache_hits + self._embedding_cache_misses
+            return {
+                "entries": len(self._embedding_cache),
+                "max_entries": self._embedding_cache_size,
+                "hits": self._embedding_cache_hits,
+                "misses": self._embedding_cache_misses,
+                "hit_rate": (self._embedding_cache_hits / lookups) if lookups else 0.0
+            }
+
+    @staticmethod
+    def _public_metadata(metadata: Optional[Metadata]) -> Optional[Dict[str, Any]]:
+        """Metadata as returned to API clients, without internal bookkeeping keys."""
+        if metadata is None:
+            return None
+        return {key: value for key, value in metadata.items() if key != CONTENT_HASH_KEY}
+
+    def _query_by_embedding(self, query_embedding: List[float], n_results: int,
+                            where: Optional[Dict[str, Any]] = None,
+                            min_similarity: Optional[float] = None) -> List[Dict[str, Any]]:
+        results: Any = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        # Format results
+        formatted_results = []
+        for i in range(len(results['ids'][0])):
+            distance = results['distances'][0][i]
+            similarity = 1 - distance  # Convert distance to similarity
+            if min_similarity is not None and similarity < min_similarity:
+                continue
+            formatted_results.append({
+                "id": results['ids'][0][i],
+                "document": results['documents'][0][i],
+                "metadata": self._public_metadata(results['metadatas'][0][i]),
+                "distance": distance,
+                "similarity": similarity
+            })
+        return formatted_results
+
     def query_documents(self, query_text: str, n_results: int = 5,
                         where: Optional[Dict[str, Any]] = None,
                         min_similarity: Optional[float] = None) -> Dict[str, Any]:
@@ -76,27 +405,8 @@ class ChromaDBService:
             Dictionary with query results
         """
         try:
-            # Query the collection (ChromaDB will generate query embedding automatically)
-            results: Any = self.collection.query(
-                query_texts=[query_text],
-                n_results=n_results,
-                where=where,
-                include=["documents", "metadatas", "distances"]
-            )
-            # Format results
-            formatted_results = []
-            for i in range(len(results['ids'][0])):
-                distance = results['distances'][0][i]
-                similarity = 1 - distance  # Convert distance to similarity
-                if min_similarity is not None and similarity < min_similarity:
-                    continue
-                formatted_results.append({
-                    "id": results['ids'][0][i],
-                    "document": results['documents'][0][i],
-                    "metadata": results['metadatas'][0][i],
-                    "distance": distance,
-                    "similarity": similarity
-                })
+            query_embedding = self.embed_query(query_text)
+            formatted_results = self._query_by_embedding(query_embedding, n_results, where, min_similarity)
             return {
                 "status": "success",
                 "query": query_text,
@@ -109,6 +419,46 @@ class ChromaDBService:
                 "message": str(e)
             }
 
+    def query_documents_multi(self, query_text: str,
+                              searches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run several searches for the same query text, embedding it only once.
+        The searches run concurrently against the shared query embedding.
+        
+        Args:
+            query_text: The text query to search for
+            searches: List of dicts with "n_results" and optional "where" / "min_similarity"
+        
+        Returns:
+            One result dictionary per search, in the same shape as query_documents
+        """
+        try:
+            query_embedding = self.embed_query(query_text)
+        except Exception as e:
+            return [{"status": "error", "message": str(e)} for _ in searches]
+
+        def run_search(search: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                formatted_results = self._query_by_embedding(
+                    query_embedding,
+                    search.get("n_results", 5),
+                    search.get("where"),
+                    search.get("min_similarity")
+                )
+                return {
+                    "status": "success",
+                    "query": query_text,
+                    "results": formatted_results,
+                    "count": len(formatted_results)
+                }
+            except Exception as e:
+                return {
+                    "status": "error",
+                    "message": str(e)
+                }
+
+        return list(self._query_executor.map(run_search, searches))
+
     def delete_documents(self, ids: List[str]) -> Dict[str, Any]:
         """
         Delete documents from the collection
@@ -121,6 +471,7 @@ class ChromaDBService:
         """
         try:
             self.collection.delete(ids=ids)
+            self._notify_write(ids)
             return {
                 "status": "success",
                 "message": f"Deleted {len(ids)} documents",
@@ -144,7 +495,8 @@ class ChromaDBService:
             return {
                 "status": "success",
                 "collection_name": self.collection_name,
-                "document_count": count
+                "document_count": count,
+                "embedding_cache": self.get_embedding_cache_stats()
             }
         except Exception as e:
             return {
@@ -166,15 +518,16 @@ class ChromaDBService:
             Dictionary with status
         """
         try:
-            # Update the document (ChromaDB will generate new embedding automatically)
-            update_kwargs = {
-                "ids": [document_id],
-                "documents": [document]
-            }
-            if metadata is not None:
-                # metadata is guarded by the if-check above, so it's non-None here
-                update_kwargs["metadatas"] = [metadata]  # type: ignore[assignment]
-            self.collection.update(**update_kwargs)
+            # Update the document and its embedding from the shared model
+            # The text hash is always written; update merges it into the
+            # stored metadata, so the rest is kept when metadata is None
+            self.collection.update(
+                ids=[document_id],
+                documents=[document],
+                embeddings=self._embed([document]),
+                metadatas=self._with_content_hashes([document], [metadata])
+            )
+            self._notify_write([document_id])
             return {
                 "status": "success",
                 "message": f"Updated document {document_id}",
@@ -7,13 +7,29 @@ and automatic bidirectional connections between classrooms.
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Account, Profile, Relation
-from chromadb_service import ChromaDBService
+from chromadb_service import get_chroma_service
+from index_queue import index_document, remove_document
 from penpals_helper import PenpalsHelper
 import json
 
 classroom_bp = Blueprint('classroom', __name__)
 
-chroma_service = ChromaDBService(persist_directory="./chroma_db", collection_name="classroom_interests")
+chroma_service = get_chroma_service("classroom_interests")
+
+
+def build_classroom_index_entry(classroom: Profile):
+    """
+    Return (doc_id, document, metadata) for a classroom's interests, or None
+    if it has no interests to match on.
+    """
+    interests = classroom.interests or []
+    if not interests:
+        return None
+    return f"classroom_{classroom.id}", " ".join(interests), {
+        "classroom_id": classroom.id,
+        "classroom_name": classroom.name,
+        "location": classroom.location or ""
+    }
 
 
 @classroom_bp.route('/api/classrooms', methods=['POST'])
@@ -79,24 +95,15 @@ def create_classroom():
         db.session.add(classroom)
         db.session.flush()
         
-        # Store interests in ChromaDB for semantic matching
-        if interests:
-            interests_text = " ".join(interests)
-            chroma_result = chroma_service.add_documents(
-                documents=[interests_text],
-                metadatas=[{
-                    "classroom_id": classroom.id,
-                    "classroom_name": classroom.name,
-                    "location": classroom.location or ""
-                }],
-                ids=[f"classroom_{classroom.id}"]
-            )
-            
-            if chroma_result['status'] != 'success':
-                print(f"ChromaDB add warning: {chroma_result.get('message')}")
-        
         db.session.commit()
         
+        # Store interests in ChromaDB for semantic matching (written behind the request)
+        if interests:
+            try:
+                index_document(chroma_service.collection_name, *build_classroom_index_entry(classroom))
+            except Exception as e:
+                print(f"ChromaDB add warning: {e}")
+        
         classroom_data = PenpalsHelper.format_classroom_response(classroom)
         
         return jsonify({
@@ -223,30 +230,19 @@ def update_classroom(classroom_id):
             interests = PenpalsHelper.sanitize_interests(raw_interests)
             classroom.interests = interests
         
-        # Update ChromaDB if interests changed
-        new_interests = classroom.interests or []
-        if old_interests != new_interests:
-            try:
-                # Delete old entry
-                chroma_service.delete_documents([f"classroom_{classroom.id}"])
-                
-                # Add new entry if interests exist
-                if new_interests:
-                    interests_text = " ".join(new_interests)
-                    chroma_service.add_documents(
-                        documents=[interests_text],
-                        metadatas=[{
-                            "classroom_id": classroom.id,
-                            "classroom_name": classroom.name,
-                            "location": classroom.location or ""
-                        }],
-                        ids=[f"classroom_{classroom.id}"]
-                    )
-            except Exception as e:
-                print(f"ChromaDB update error: {e}")
-        
         db.session.commit()
         
+        # Keep ChromaDB in sync; the interests are only re-embedded when they
+        # changed, a rename or move just updates the metadata
+        entry = build_classroom_index_entry(classroom)
+        try:
+            if entry is not None:
+                index_document(chroma_service.collection_name, *entry)
+            elif old_interests:
+                remove_document(chroma_service.collection_name, f"classroom_{classroom.id}")
+        except Exception as e:
+            print(f"ChromaDB update error: {e}")
+        
         classroom_data = PenpalsHelper.format_classroom_response(classroom)
         
         return jsonify({
@@ -276,15 +272,16 @@ def delete_classroom(classroom_id):
         # Get connection count for confirmation
         connections_count = classroom.sent_relations.count()
         
+        classroom_doc_id = f"classroom_{classroom.id}"
+        db.session.delete(classroom)
+        db.session.commit()
+        
         # Remove from ChromaDB
         try:
-            chroma_service.delete_documents([f"classroom_{classroom.id}"])
+            remove_document(chroma_service.collection_name, classroom_doc_id)
         except Exception as e:
             print(f"ChromaDB delete error: {e}")
         
-        db.session.delete(classroom)
-        db.session.commit()
-        
         return jsonify({
             "msg": "Classroom deleted successfully",
             "deleted_connections": connections_count
@@ -0,0 +1,253 @@
+"""
+Write-behind indexing queue for ChromaDB.
+
+Write endpoints (posts, meetings, classrooms) enqueue their index changes
+here instead of embedding inside the request. A worker thread collects
+pending changes for up to CHROMA_INDEX_FLUSH_SECONDS and writes them with one
+upsert (and one delete) per collection, so bursts of writes share an
+embedding batch. Pending changes are keyed by (collection, document id) and
+the newest one wins, so a create followed by a delete never leaves an orphan.
+
+Every change is appended to a journal file before the request returns and
+the journal is compacted once the change is written, so anything not yet
+indexed when the process dies is replayed on the next start.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from chromadb_service import get_chroma_service
+
+CHROMA_INDEX_ASYNC = os.getenv("CHROMA_INDEX_ASYNC", "true").lower() == "true"
+CHROMA_INDEX_BATCH_SIZE = int(os.getenv("CHROMA_INDEX_BATCH_SIZE", "64"))
+CHROMA_INDEX_FLUSH_SECONDS = float(os.getenv("CHROMA_INDEX_FLUSH_SECONDS", "0.5"))
+CHROMA_INDEX_JOURNAL = os.getenv("CHROMA_INDEX_JOURNAL", "./chroma_index_pending.jsonl")
+MAX_RETRY_DELAY_SECONDS = 30.0
+
+OpKey = Tuple[str, str]
+
+
+class IndexingQueue:
+    def __init__(self, get_service: Callable[[str], Any], journal_path: Optional[str] = None,
+                 batch_size: int = 64, flush_seconds: float = 0.5):
+        """
+        Args:
+            get_service: returns the ChromaDBService for a collection name
+            journal_path: file pending changes are persisted to (None to keep them in memory only)
+            batch_size: max changes written per batch
+            flush_seconds: how long the worker waits for a batch to fill
+        """
+        self.get_service = get_service
+        self.journal_path = journal_path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = max(0.0, flush_seconds)
+        self._pending: "OrderedDict[OpKey, Dict[str, Any]]" = OrderedDict()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._failures = 0
+        self._retry_at = 0.0
+        self._last_error: Optional[str] = None
+        self._written = 0
+        self._batches = 0
+        self._recovered = self._load_journal()
+        self._thread = threading.Thread(target=self._run, name="chroma-indexer", daemon=True)
+        self._thread.start()
+
+    def upsert(self, collection: str, doc_id: str, document: str, metadata: Dict[str, Any]):
+        self._enqueue({"op": "upsert", "collection": collection, "id": doc_id,
+                       "document": document, "metadata": metadata})
+
+    def delete(self, collection: str, doc_id: str):
+        self._enqueue({"op": "delete", "collection": collection, "id": doc_id})
+
+    def _enqueue(self, op: Dict[str, Any]):
+        with self._changed:
+            key = (op["collection"], op["id"])
+            # Re-insert at the end so the newest change for a document wins
+            self._pending.pop(key, None)
+            self._pending[key] = op
+            self._append_journal(op)
+            self._changed.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far has been written (or timeout)."""
+        with self._changed:
+            self._changed.notify_all()
+            return self._changed.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    # Journal
+
+    def _append_journal(self, op: Dict[str, Any]):
+        if not self.journal_path:
+            return
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(op) + "\n")
+        except OSError as e:
+            print(f"ChromaDB index journal write failed: {e}")
+
+    def _compact_journal_locked(self):
+        """Rewrite the journal with only the changes still pending."""
+        if not self.journal_path:
+            return
+        try:
+            if not self._pending:
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                return
+            temp_path = f"{self.journal_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as journal:
+                for op in self._pending.values():
+                    journal.write(json.dumps(op) + "\n")
+            os.replace(temp_path, self.journal_path)
+        except OSError as e:
+            print(f"ChromaDB index journal compaction failed: {e}")
+
+    def _load_journal(self) -> int:
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as journal:
+                lines = journal.readlines()
+        except OSError as e:
+            print(f"ChromaDB index journal read failed: {e}")
+            return 0
+        for line in lines:
+            try:
+                op = json.loads(line)
+                key = (op["collection"], op["id"])
+            except (ValueError, KeyError, TypeError):
+                # A torn final line from a crash mid-append
+                continue
+            self._pending.pop(key, None)
+            self._pending[key] = op
+        return len(self._pending)
+
+    # Worker
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._changed:
+            while True:
+                self._changed.wait_for(lambda: self._pending)
+                delay = self._retry_at - time.monotonic()
+                if delay <= 0:
+                    break
+                self._changed.wait(delay)
+            if len(self._pending) < self.batch_size and self.flush_seconds:
+                # Give a burst of writes a moment to join the batch
+                self._changed.wait_for(lambda: len(self._pending) >= self.batch_size, self.flush_seconds)
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popitem(last=False)[1])
+            self._in_flight = len(batch)
+            return batch
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        by_collection: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for op in batch:
+            by_collection.setdefault(op["collection"], {"upsert": [], "delete": []})[op["op"]].append(op)
+
+        for collection, ops in by_collection.items():
+            service = self.get_service(collection)
+            if ops["upsert"]:
+                result = service.upsert_documents(
+                    [op["document"] for op in ops["upsert"]],
+                    ids=[op["id"] for op in ops["upsert"]],
+                    metadatas=[op["metadata"] for op in ops["upsert"]],
+                )
+                if result.get("status") != "success":
+                    raise RuntimeError(result.get("message"))
+            if ops["delete"]:
+                result = service.delete_documents([op["id"] for op in ops["delete"]])
+                if result.get("status") != "success":
+                    raise RuntimeError(result.get("message"))
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._write_batch(batch)
+                error = None
+            except Exception as e:
+                error = str(e)
+
+            with self._changed:
+                self._in_flight = 0
+                if error is None:
+                    self._written += len(batch)
+                    self._batches += 1
+                    self._failures = 0
+                    self._retry_at = 0.0
+                    self._compact_journal_locked()
+                else:
+                    # Put the batch back unless a newer change for the same document arrived
+                    for op in reversed(batch):
+                        key = (op["collection"], op["id"])
+                        if key not in self._pending:
+                            self._pending[key] = op
+                            self._pending.move_to_end(key, last=False)
+                    self._failures += 1
+                    self._last_error = error
+                    self._retry_at = time.monotonic() + min(MAX_RETRY_DELAY_SECONDS, 2 ** self._failures)
+                    print(f"ChromaDB indexing batch failed (attempt {self._failures}): {error}")
+                self._changed.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "in_flight": self._in_flight,
+                "written": self._written,
+                "batches": self._batches,
+                "recovered": self._recovered,
+                "consecutive_failures": self._failures,
+                "last_error": self._last_error,
+                "journal": self.journal_path,
+            }
+
+
+_QUEUE_LOCK = threading.Lock()
+_QUEUE: Optional[IndexingQueue] = None
+
+
+def get_index_queue() -> IndexingQueue:
+    """The process-wide queue; starting it replays any journaled changes."""
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = IndexingQueue(
+                get_chroma_service,
+                journal_path=CHROMA_INDEX_JOURNAL,
+                batch_size=CHROMA_INDEX_BATCH_SIZE,
+                flush_seconds=CHROMA_INDEX_FLUSH_SECONDS,
+            )
+        return _QUEUE
+
+
+def queue_started() -> bool:
+    return _QUEUE is not None
+
+
+def index_document(collection: str, doc_id: str, document: str, metadata: Dict[str, Any]):
+    """Upsert one document, in the background unless CHROMA_INDEX_ASYNC is off."""
+    if CHROMA_INDEX_ASYNC:
+        get_index_queue().upsert(collection, doc_id, document, metadata)
+        return
+    result = get_chroma_service(collection).upsert_documents([document], ids=[doc_id], metadatas=[metadata])
+    if result.get("status") != "success":
+        raise RuntimeError(result.get("message"))
+
+
+def remove_document(collection: str, doc_id: str):
+    """Delete one document, ordered after any queued upsert of the same ID."""
+    if CHROMA_INDEX_ASYNC:
+        get_index_queue().delete(collection, doc_id)
+        return
+    result = get_chroma_service(collection).delete_documents([doc_id])
+    if result.get("status") != "success":
+        raise RuntimeError(result.get("message"))
@@ -0,0 +1,453 @@
+"""
+Out-of-process OpenVINO inference workers.
+
+The OpenVINO runtime can segfault under sustained load (see
+OPENVINO_CRASH_NOTES.txt). Running the LLMPipeline inside child processes
+keeps a native crash from taking down the Flask API: the supervisor notices
+the dead worker, starts a fresh one and retries the in-flight request.
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+WORKER_PROCESSES = int(os.getenv("OPENVINO_WORKER_PROCESSES", "0"))
+WORKER_MAX_RETRIES = int(os.getenv("OPENVINO_WORKER_MAX_RETRIES", "1"))
+WORKER_MAX_QUEUE = int(os.getenv("OPENVINO_WORKER_MAX_QUEUE", "32"))
+WORKER_TIMEOUT_SECONDS = float(os.getenv("OPENVINO_WORKER_TIMEOUT_SECONDS", "300"))
+
+_POLL_INTERVAL_SECONDS = 0.5
+_SPAWN_LOCK = threading.Lock()
+
+
+def _cancel_requested(conn) -> bool:
+    """Non-blocking check for a cancel message from the supervisor."""
+    if not conn.poll():
+        return False
+    message = conn.recv()
+    return isinstance(message, dict) and message.get("cancel", False)
+
+
+def _worker_main(conn):
+    """Child process entrypoint: serve generation requests over a pipe."""
+    import openvino_chat
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        if request.get("cancel"):
+            # Arrived after the stream it was meant for had already finished
+            continue
+
+        prompt = request.get("prompt", "")
+        options = request.get("options")
+        timings = {}
+        try:
+            if request.get("warmup"):
+                openvino_chat._get_pipeline()
+                conn.send(("done", None))
+            elif request.get("stream"):
+                tokens = openvino_chat._generate_stream_in_process(prompt, options=options, timings=timings)
+                try:
+                    for token in tokens:
+                        conn.send(("token", token))
+                        if _cancel_requested(conn):
+                            break
+                finally:
+                    # Closing sets the job's stop event, which cancels generation
+                    tokens.close()
+                conn.send(("timings", timings))
+                conn.send(("done", None))
+            else:
+                reply = openvino_chat._generate_in_process(prompt, options=options, timings=timings)
+                conn.send(("timings", timings))
+                conn.send(("done", reply))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised when a worker dies and the request cannot be retried."""
+
+
+class InferenceQueueFullError(RuntimeError):
+    """Raised when the pool already has max_queue requests waiting."""
+
+
+class _InferenceJob:
+    def __init__(self, job_id: int, prompt: str, stream: bool, warmup: bool = False,
+                 options: Optional[Dict[str, Any]] = None):
+        self.id = job_id
+        self.prompt = prompt
+        self.options = options or {}
+        self.stream = stream
+        self.warmup = warmup
+        self.events: "queue.Queue[tuple]" = queue.Queue()
+        self.tokens_sent = False
+        # Set when the consumer stops reading a stream (e.g. the client disconnected)
+        self.cancelled = threading.Event()
+        self.enqueued_at = time.monotonic()
+        self.pool_wait_seconds: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+
+    def reported_timings(self) -> Dict[str, float]:
+        """Worker-side timings shifted to include the time spent in the pool queue."""
+        timings = dict(self.timings)
+        pool_wait = self.pool_wait_seconds or 0.0
+        timings["queue_wait_seconds"] = pool_wait + timings.get("queue_wait_seconds", 0.0)
+        if "ttft_seconds" in timings:
+            timings["ttft_seconds"] += pool_wait
+        return timings
+
+
+class _WorkerHandle:
+    """One child process plus the supervisor thread that feeds it jobs."""
+
+    def __init__(self, index: int, pool: "InferenceWorkerPool"):
+        self.index = index
+        self.pool = pool
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        self.busy = False
+        self.state = "idle"
+        self.load_seconds = None
+        self.error = None
+        self.warmed_once = False
+        self.thread = threading.Thread(
+            target=self._run, name=f"inference-worker-{index}", daemon=True
+        )
+
+    def start(self):
+        self._spawn()
+        self.thread.start()
+
+    def _spawn(self):
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn,),
+            name=f"openvino-worker-{self.index}",
+            daemon=True,
+        )
+        with _SPAWN_LOCK:
+            # A spawned child first re-runs the parent's __main__ module. When
+            # the server was launched as `python main.py` that would redo the
+            # whole app/DB/Chroma setup in every worker, so present this
+            # side-effect-free module as __main__ while the child is prepared.
+            main_module = sys.modules.get("__main__")
+            sys.modules["__main__"] = sys.modules[__name__]
+            try:
+                process.start()
+            finally:
+                sys.modules["__main__"] = main_module
+        child_conn.close()
+        self.process = process
+        self.conn = parent_conn
+
+    def _restart(self):
+        self._kill()
+        self.restarts += 1
+        self.state = "idle"
+        self._spawn()
+
+    def warm_up(self):
+        """Have the child load and prime its pipeline; runs on this handle's own thread."""
+        self.state = "loading"
+        started = time.monotonic()
+        job = _InferenceJob(0, "", stream=False, warmup=True)
+        if not self.is_alive():
+            self._restart()
+        outcome = self._run_attempt(job)
+        kind, payload = job.events.get() if not job.events.empty() else ("crashed", "worker exited")
+        if outcome == "ok" and kind == "done":
+            self.state = "ready"
+            self.load_seconds = round(time.monotonic() - started, 3)
+            self.error = None
+        else:
+            if outcome != "ok":
+                self._restart()
+            self.state = "error"
+            self.error = payload if kind == "error" else "Inference worker failed to load the model"
+
+    def _kill(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+
+    def is_alive(self) -> bool:
+        return bool(self.process and self.process.is_alive())
+
+    def _run(self):
+        while True:
+            if self.pool._warm_up_requested.is_set() and not self.warmed_once:
+                self.state = "loading"
+                self.warmed_once = True
+                self.warm_up()
+                continue
+            try:
+                job = self.pool._jobs.get(timeout=_POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+            if job is None:
+                break
+            self.busy = True
+            try:
+                self._process_job(job)
+            finally:
+                self.busy = False
+
+    def _process_job(self, job: _InferenceJob):
+        job.pool_wait_seconds = time.monotonic() - job.enqueued_at
+        attempt = 0
+        while True:
+            if job.cancelled.is_set():
+                job.events.put(("done", None))
+                return
+            if not self.is_alive():
+                self._restart()
+
+            outcome = self._run_attempt(job)
+            if outcome == "ok":
+                return
+            if outcome == "timeout":
+                self._restart()
+                job.events.put(("error", "Inference worker timed out"))
+                return
+
+            # The worker died mid-request.
+            self._restart()
+            can_retry = attempt < self.pool.max_retries and not job.tokens_sent
+            if not can_retry:
+                job.events.put(("crashed", "Inference worker crashed while generating a reply"))
+                return
+            attempt += 1
+            self.pool._record_retry()
+
+    def _run_attempt(self, job: _InferenceJob) -> str:
+        try:
+            self.conn.send({
+                "prompt": job.prompt,
+                "stream": job.stream,
+                "warmup": job.warmup,
+                "options": job.options,
+            })
+        except (OSError, EOFError, BrokenPipeError):
+            return "crashed"
+
+        # Idle timeout: a stream that keeps producing tokens is never cut off
+        deadline = time.monotonic() + self.pool.timeout_seconds
+        cancel_sent = False
+        while True:
+            if job.cancelled.is_set() and not cancel_sent:
+                try:
+                    self.conn.send({"cancel": True})
+                except (OSError, EOFError, BrokenPipeError):
+                    return "crashed"
+                cancel_sent = True
+
+            try:
+                ready = self.conn.poll(_POLL_INTERVAL_SECONDS)
+            except (OSError, EOFError):
+                return "crashed"
+
+            if not ready:
+                if not self.is_alive():
+                    return "crashed"
+                if time.monotonic() > deadline:
+                    return "timeout"
+                continue
+
+            try:
+                kind, payload = self.conn.recv()
+            except (OSError, EOFError):
+                return "crashed"
+
+            if kind == "token":
+                deadline = time.monotonic() + self.pool.timeout_seconds
+                job.tokens_sent = True
+                if not cancel_sent:
+                    job.events.put(("token", payload))
+                continue
+            if kind == "timings":
+                job.timings = payload or {}
+                continue
+
+            if kind == "done" and not job.warmup:
+                # A completed request also proves the model is loaded.
+                self.state = "ready"
+            job.events.put((kind, payload))
+            return "ok"
+
+
+class InferenceWorkerPool:
+    """Supervised pool of OpenVINO worker processes with a bounded request queue."""
+
+    def __init__(self, size: int, max_retries: int = 1, max_queue: int = 32,
+                 timeout_seconds: float = 300.0):
+        self.size = max(1, size)
+        self.max_retries = max(0, max_retries)
+        self.timeout_seconds = timeout_seconds
+        self._jobs: "queue.Queue[Optional[_InferenceJob]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._job_ids = itertools.count(1)
+        self._stats_lock = threading.Lock()
+        self._retries = 0
+        self._warm_up_requested = threading.Event()
+        self._workers: List[_WorkerHandle] = [_WorkerHandle(i, self) for i in range(self.size)]
+        for worker in self._workers:
+            worker.start()
+
+    def _record_retry(self):
+        with self._stats_lock:
+            self._retries += 1
+
+    def _submit(self, prompt: str, stream: bool,
+                options: Optional[Dict[str, Any]] = None) -> _InferenceJob:
+        job = _InferenceJob(next(self._job_ids), prompt, stream, options=options)
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            raise InferenceQueueFullError("Chat inference queue is full, please retry shortly")
+        return job
+
+    @staticmethod
+    def _raise_for_event(kind: str, payload: Any):
+        if kind == "crashed":
+            raise WorkerCrashedError(payload)
+        raise RuntimeError(f"Generation failed: {payload}")
+
+    def generate(self, prompt: str, options: Optional[Dict[str, Any]] = None,
+                 timings: Optional[Dict[str, float]] = None) -> str:
+        job = self._submit(prompt, stream=False, options=options)
+        kind, payload = job.events.get()
+        if timings is not None:
+            timings.update(job.reported_timings())
+        if kind != "done":
+            self._raise_for_event(kind, payload)
+        return payload
+
+    def generate_stream(self, prompt: str, options: Optional[Dict[str, Any]] = None,
+                        timings: Optional[Dict[str, float]] = None) -> Iterable[str]:
+        """
+        Queue a streaming request right away, so a full queue raises here
+        rather than on the first read, and return an iterator over its tokens.
+        Closing the iterator early cancels generation in the worker.
+        """
+        job = self._submit(prompt, stream=True, options=options)
+        return self._stream_tokens(job, timings)
+
+    def _stream_tokens(self, job: _InferenceJob, timings: Optional[Dict[str, float]]) -> Iterable[str]:
+        try:
+            while True:
+                kind, payload = job.events.get()
+                if kind == "token":
+                    yield payload
+                elif kind == "done":
+                    if timings is not None:
+                        timings.update(job.reported_timings())
+                    return
+                else:
+                    self._raise_for_event(kind, payload)
+        finally:
+            job.cancelled.set()
+
+    def warm_up(self, wait: bool = True):
+        """Ask every worker to load its model, optionally waiting until all have finished."""
+        self._warm_up_requested.set()
+        deadline = time.monotonic() + self.timeout_seconds
+        while wait and time.monotonic() < deadline:
+            if all(w.warmed_once and w.state != "loading" for w in self._workers):
+                break
+            time.sleep(_POLL_INTERVAL_SECONDS / 5)
+
+    def readiness(self) -> Dict[str, Any]:
+        states = [w.state for w in self._workers]
+        if "ready" in states:
+            state = "ready"
+        elif "loading" in states:
+            state = "loading"
+        elif "error" in states:
+            state = "error"
+        else:
+            state = "idle"
+        load_times = [w.load_seconds for w in self._workers if w.load_seconds is not None]
+        errors = [w.error for w in self._workers if w.error]
+        return {
+            "state": state,
+            "load_seconds": max(load_times) if load_times else None,
+            "error": errors[0] if errors else None,
+            "workers_ready": states.count("ready"),
+            "workers": len(self._workers),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            retries = self._retries
+        return {
+            "mode": "worker_pool",
+            "queue_depth": self._jobs.qsize(),
+            "max_queue": self._jobs.maxsize,
+            "busy_workers": sum(1 for w in self._workers if w.busy),
+            "retries": retries,
+            "workers": [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid if w.process else None,
+                    "alive": w.is_alive(),
+                    "busy": w.busy,
+                    "state": w.state,
+                    "restarts": w.restarts,
+                }
+                for w in self._workers
+            ],
+        }
+
+    def shutdown(self):
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+            worker._kill()
+
+
+_POOL_LOCK = threading.Lock()
+_POOL: Optional[InferenceWorkerPool] = None
+
+
+def worker_pool_enabled() -> bool:
+    return WORKER_PROCESSES > 0
+
+
+def pool_started() -> bool:
+    return _POOL is not None
+
+
+def get_worker_pool() -> InferenceWorkerPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = InferenceWorkerPool(
+                WORKER_PROCESSES,
+                max_retries=WORKER_MAX_RETRIES,
+                max_queue=WORKER_MAX_QUEUE,
+                timeout_seconds=WORKER_TIMEOUT_SECONDS,
+            )
+        return _POOL
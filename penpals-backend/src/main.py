@@ -4,7 +4,7 @@ Handles authentication, basic profile operations, and ChromaDB document manageme
 Account and classroom management is handled by separate blueprints.
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from datetime import timedelta, datetime
@@ -13,8 +13,8 @@ import os
 import bcrypt
 import base64
 import mimetypes
-import tempfile
 import threading
+import time
 import importlib
 from pathlib import Path
 import json
@@ -80,16 +80,6 @@ def _is_classroom_intent_query(query: str) -> bool:
     return any(keyword in lowered for keyword in classroom_keywords)
 
 
-def _strip_model_thinking(reply: str) -> str:
-    if not isinstance(reply, str) or not reply:
-        return reply
-
-    cleaned = re.sub(r"<think>.*?</think>", "", reply, flags=re.IGNORECASE | re.DOTALL)
-    cleaned = re.sub(r"<thinking>.*?</thinking>", "", cleaned, flags=re.IGNORECASE | re.DOTALL)
-    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned)
-    return cleaned.strip()
-
-
 def validate_meeting_schedule(start_time: datetime, end_time: datetime):
     if end_time <= start_time:
         return "end_time must be after start_time"
@@ -271,8 +261,23 @@ def print_tables():
     with application.app_context():
         print("Registered tables:", [table.name for table in db.metadata.sorted_tables])
 
-from chromadb_service import ChromaDBService
-from openvino_chat import generate_reply
+from chromadb_service import get_chroma_service, get_embedding_function, get_registry_stats as get_chroma_registry_stats
+from index_queue import CHROMA_INDEX_ASYNC, get_index_queue, index_document, queue_started as index_queue_started, remove_document
+from inference_worker import InferenceQueueFullError
+from openvino_chat import generate_reply, generate_reply_stream, get_inference_stats, get_readiness as get_chat_model_readiness, normalize_generation_options, warm_up as warm_up_chat_model
+from response_cache import ChatResponseCache
+import metrics
+from transcript_cache import TranscriptCache
+import audio_prep
+from whisper_pool import (
+    FASTER_WHISPER_ACQUIRE_TIMEOUT_SECONDS,
+    FASTER_WHISPER_CPU_THREADS,
+    FASTER_WHISPER_MAX_WAITING,
+    FASTER_WHISPER_POOL_SIZE,
+    WhisperModelPool,
+    WhisperPoolBusyError,
+)
+from transcription_jobs import TranscriptionQueueFullError, get_transcription_queue, queue_started as transcription_queue_started
 
 application = Flask(__name__)
 CORS(application)
@@ -314,7 +319,22 @@ application.register_blueprint(account_bp)
 application.register_blueprint(classroom_bp)
 application.register_blueprint(messaging_bp)
 
-chroma_service = ChromaDBService(persist_directory="./chroma_db", collection_name="penpals_documents")
+chroma_service = get_chroma_service("penpals_documents")
+
+CHAT_CACHE_ENABLED = os.getenv('CHAT_CACHE_ENABLED', 'true').lower() == 'true'
+chat_response_cache = ChatResponseCache(
+    max_entries=int(os.getenv('CHAT_CACHE_MAX_ENTRIES', '512')),
+    ttl_seconds=float(os.getenv('CHAT_CACHE_TTL_SECONDS', '600')),
+    similarity_threshold=float(os.getenv('CHAT_CACHE_SIMILARITY_THRESHOLD', '0')),
+    embed_fn=chroma_service.embed_query,
+)
+chroma_service.add_write_listener(chat_response_cache.invalidate_documents)
+if CHROMA_INDEX_ASYNC:
+    # Start the indexer now so changes journaled before a crash are replayed
+    get_index_queue()
+# Always send a Server-Timing header on chat replies; clients can also ask per
+# request with "X-Chat-Timing: 1".
+CHAT_TIMING_HEADER = os.getenv('CHAT_TIMING_HEADER', 'false').lower() == 'true'
 
 _CLASSROOM_TAG_RE = re.compile(r'<classroom\s+id="[^"]+"\s*/>')
 TRANSCRIBE_MAX_AUDIO_BYTES = int(os.getenv('TRANSCRIBE_MAX_AUDIO_BYTES', str(20 * 1024 * 1024)))
@@ -322,9 +342,17 @@ FASTER_WHISPER_MODEL_SIZE = os.getenv('FASTER_WHISPER_MODEL_SIZE', 'base')
 FASTER_WHISPER_DEVICE = os.getenv('FASTER_WHISPER_DEVICE', 'cpu')
 FASTER_WHISPER_COMPUTE_TYPE = os.getenv('FASTER_WHISPER_COMPUTE_TYPE', 'int8')
 FASTER_WHISPER_BEAM_SIZE = int(os.getenv('FASTER_WHISPER_BEAM_SIZE', '1'))
-
-_FASTER_WHISPER_MODEL = None
-_FASTER_WHISPER_MODEL_LOCK = threading.Lock()
+TRANSCRIPT_CACHE_ENABLED = os.getenv('TRANSCRIPT_CACHE_ENABLED', 'true').lower() == 'true'
+transcript_cache = TranscriptCache(
+    os.getenv('TRANSCRIPT_CACHE_DIR', str(BACKEND_ROOT / 'transcript_cache')),
+    max_bytes=int(os.getenv('TRANSCRIPT_CACHE_MAX_BYTES', str(50 * 1024 * 1024))),
+)
+
+_FASTER_WHISPER_POOL = None
+_FASTER_WHISPER_POOL_LOCK = threading.Lock()
+_FASTER_WHISPER_READINESS = {"state": "idle", "load_seconds": None, "error": None}
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_STATE = {"started": False, "finished": False, "seconds": None}
 _MEETING_TAG_RE = re.compile(r'<meeting\s+id="[^"]+"\s*/>')
 
 
@@ -339,20 +367,15 @@ def _build_meeting_index_document(meeting: Meeting) -> str:
     )
 
 
-def _sync_meeting_in_chroma(meeting: Meeting):
-    if not meeting:
-        return
-
-    doc_id = f"meeting-{meeting.id}"
+def build_meeting_index_entry(meeting: Meeting):
+    """
+    Return (doc_id, document, metadata) for a meeting, or None if it should
+    not be searchable (private, cancelled or without a description).
+    """
     description = (meeting.description or "").strip()
     should_index = meeting.visibility == 'public' and meeting.status != 'cancelled' and len(description) > 0
-
     if not should_index:
-        try:
-            chroma_service.delete_documents([doc_id])
-        except Exception as e:
-            application.logger.warning("Failed removing meeting from ChromaDB: %s", e)
-        return
+        return None
 
     metadata = {
         "source": "meeting",
@@ -366,18 +389,36 @@ def _sync_meeting_in_chroma(meeting: Meeting):
         "visibility": meeting.visibility,
         "status": meeting.status,
     }
+    return f"meeting-{meeting.id}", _build_meeting_index_document(meeting), metadata
 
-    try:
-        chroma_service.delete_documents([doc_id])
-    except Exception:
-        pass
 
+def build_post_index_entry(post: Post):
+    """Return (doc_id, document, metadata) for a post."""
+    return f"post-{post.id}", post.content, {
+        "source": "post",
+        "post_id": str(post.id),
+        "author": post.profile.name,
+        "classroom_id": str(post.profile_id),
+        "timestamp": post.created_at.isoformat()
+    }
+
+
+def _sync_meeting_in_chroma(meeting: Meeting):
+    if not meeting:
+        return
+
+    entry = build_meeting_index_entry(meeting)
+    if entry is None:
+        try:
+            remove_document(chroma_service.collection_name, f"meeting-{meeting.id}")
+        except Exception as e:
+            application.logger.warning("Failed removing meeting from ChromaDB: %s", e)
+        return
+
+    # Upsert re-embeds only when the indexed text changed; status or
+    # visibility edits become a metadata-only update
     try:
-        chroma_service.add_documents(
-            [_build_meeting_index_document(meeting)],
-            metadatas=[metadata],
-            ids=[doc_id]
-        )
+        index_document(chroma_service.collection_name, *entry)
     except Exception as e:
         application.logger.warning("Failed indexing meeting in ChromaDB: %s", e)
 
@@ -474,68 +515,164 @@ def _extract_transcript_text(vibevoice_content):
     return str(vibevoice_content or "").strip()
 
 
-def _audio_suffix_from_mime(mime_type: str) -> str:
-    mime_to_suffix = {
-        'audio/wav': '.wav',
-        'audio/x-wav': '.wav',
-        'audio/mpeg': '.mp3',
-        'audio/mp4': '.m4a',
-        'audio/flac': '.flac',
-        'audio/ogg': '.ogg',
-        'audio/webm': '.webm',
-        'video/webm': '.webm',
-        'video/mp4': '.mp4',
-    }
-    return mime_to_suffix.get((mime_type or '').lower(), '.webm')
+def _create_faster_whisper_model(cpu_threads: int):
+    if _FASTER_WHISPER_READINESS["state"] != "ready":
+        _FASTER_WHISPER_READINESS.update(state="loading", error=None)
+    started = time.perf_counter()
+    try:
+        model = WhisperModel(
+            FASTER_WHISPER_MODEL_SIZE,
+            device=FASTER_WHISPER_DEVICE,
+            compute_type=FASTER_WHISPER_COMPUTE_TYPE,
+            cpu_threads=cpu_threads,
+        )
+    except Exception as e:
+        _FASTER_WHISPER_READINESS.update(state="error", error=str(e))
+        raise
+    _FASTER_WHISPER_READINESS.update(
+        state="ready",
+        load_seconds=round(time.perf_counter() - started, 3),
+    )
+    return model
 
 
-def _get_faster_whisper_model():
+def _get_faster_whisper_pool() -> WhisperModelPool:
     global WhisperModel
     if WhisperModel is None:
         try:
             faster_whisper_module = importlib.import_module('faster_whisper')
             WhisperModel = faster_whisper_module.WhisperModel
         except Exception as import_error:
+            _FASTER_WHISPER_READINESS.update(state="error", error=f"faster-whisper is not installed: {import_error}")
             raise RuntimeError(f"faster-whisper is not installed: {import_error}")
 
-    global _FASTER_WHISPER_MODEL
-    with _FASTER_WHISPER_MODEL_LOCK:
-        if _FASTER_WHISPER_MODEL is None:
-            _FASTER_WHISPER_MODEL = WhisperModel(
-                FASTER_WHISPER_MODEL_SIZE,
-                device=FASTER_WHISPER_DEVICE,
-                compute_type=FASTER_WHISPER_COMPUTE_TYPE,
+    global _FASTER_WHISPER_POOL
+    with _FASTER_WHISPER_POOL_LOCK:
+        if _FASTER_WHISPER_POOL is None:
+            # Models load lazily on first use (or during warm-up)
+            _FASTER_WHISPER_POOL = WhisperModelPool(
+                _create_faster_whisper_model,
+                size=FASTER_WHISPER_POOL_SIZE,
+                total_cpu_threads=FASTER_WHISPER_CPU_THREADS,
+                max_waiting=FASTER_WHISPER_MAX_WAITING,
+                acquire_timeout_seconds=FASTER_WHISPER_ACQUIRE_TIMEOUT_SECONDS,
             )
-    return _FASTER_WHISPER_MODEL
+    return _FASTER_WHISPER_POOL
 
 
-def _transcribe_with_faster_whisper(audio_bytes: bytes, mime_type: str, hotwords: str = '') -> str:
-    model = _get_faster_whisper_model()
-    suffix = _audio_suffix_from_mime(mime_type)
-    temp_path = None
+def _prime_faster_whisper_model(model):
+    import numpy as np
+    # One second of silence exercises the encoder/decoder without needing a sample file
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1, vad_filter=False, language='en')
+    list(segments)
 
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(audio_bytes)
-            temp_path = temp_file.name
 
-        initial_prompt = f"Important context terms: {hotwords}" if hotwords else None
+def _warm_up_faster_whisper():
+    _get_faster_whisper_pool().warm_up(_prime_faster_whisper_model)
+
+
+def _warm_up_embedding_model():
+    # Shared by every ChromaDB collection, so one call loads it for all of them
+    get_embedding_function()(["warm up"])
+
+
+def start_model_warmup():
+    """Load the chat, embedding and transcription models in the background so the first requests are fast."""
+    with _WARMUP_LOCK:
+        if _WARMUP_STATE["started"]:
+            return
+        _WARMUP_STATE["started"] = True
+
+    def run_warmup():
+        started = time.perf_counter()
+        for name, warm_up in (
+            ("chat model", warm_up_chat_model),
+            ("embedding model", _warm_up_embedding_model),
+            ("faster-whisper", _warm_up_faster_whisper),
+        ):
+            try:
+                warm_up()
+                application.logger.info("Warm-up of %s finished", name)
+            except Exception as e:
+                application.logger.warning("Warm-up of %s failed: %s", name, e)
+        _WARMUP_STATE.update(finished=True, seconds=round(time.perf_counter() - started, 3))
+
+    threading.Thread(target=run_warmup, name="model-warmup", daemon=True).start()
+
+
+def _iter_faster_whisper_segments(audio_bytes: bytes, hotwords: str = '', deadline=None):
+    """
+    Yield {"start", "end", "text"} dicts as faster-whisper decodes each segment.
+    Complete transcripts are cached on disk by audio hash, so a re-submitted
+    recording is replayed from the cache instead of decoded again. With a
+    deadline (time.monotonic()), waiting for a Whisper model stops there.
+    """
+    if not TRANSCRIPT_CACHE_ENABLED:
+        yield from _decode_faster_whisper_segments(audio_bytes, hotwords, deadline)
+        return
+
+    cache_key = TranscriptCache.make_key(
+        audio_bytes,
+        model_size=FASTER_WHISPER_MODEL_SIZE,
+        beam_size=FASTER_WHISPER_BEAM_SIZE,
+        hotwords=hotwords,
+        **audio_prep.cache_params(),
+    )
+    cached_segments = transcript_cache.get(cache_key)
+    if cached_segments is not None:
+        yield from cached_segments
+        return
+
+    segments = []
+    for segment in _decode_faster_whisper_segments(audio_bytes, hotwords, deadline):
+        segments.append(segment)
+        yield segment
+    # Only reached when the decode ran to completion (not timed out or abandoned)
+    transcript_cache.put(cache_key, segments)
+
+
+def _decode_faster_whisper_segments(audio_bytes: bytes, hotwords: str = '', deadline=None):
+    pool = _get_faster_whisper_pool()
+    # Decode, duration-check and trim before taking a model so pool slots are
+    # only held for inference. Raises AudioTooLongError / ValueError.
+    audio = audio_prep.prepare_audio(audio_bytes)
+    if audio.samples.size == 0:
+        return
+    offset = audio.offset_seconds
+
+    initial_prompt = f"Important context terms: {hotwords}" if hotwords else None
+    remaining = None if deadline is None else deadline - time.monotonic()
+    if remaining is not None and remaining <= 0:
+        raise TimeoutError("Transcription deadline passed before a model was free")
+    with pool.acquire(timeout=remaining) as model:
         segments, _ = model.transcribe(
-            temp_path,
+            audio.samples,
             beam_size=FASTER_WHISPER_BEAM_SIZE,
             vad_filter=True,
             initial_prompt=initial_prompt,
         )
-        transcript = " ".join(segment.text.strip() for segment in segments if segment.text and segment.text.strip()).strip()
-        if not transcript:
-            raise RuntimeError("faster-whisper returned an empty transcript")
-        return transcript
-    finally:
-        if temp_path:
-            try:
-                os.remove(temp_path)
-            except OSError:
-                pass
+        # faster-whisper decodes lazily, so the model stays checked out while iterating
+        for segment in segments:
+            text = (segment.text or '').strip()
+            if text:
+                # Timestamps refer to the original recording, not the trimmed clip
+                yield {
+                    "start": round(segment.start + offset, 2),
+                    "end": round(segment.end + offset, 2),
+                    "text": text,
+                }
+
+
+def _transcription_queue():
+    return get_transcription_queue(_iter_faster_whisper_segments)
+
+
+def _transcribe_with_faster_whisper(audio_bytes: bytes, mime_type: str, hotwords: str = '') -> str:
+    segments = _iter_faster_whisper_segments(audio_bytes, hotwords)
+    transcript = " ".join(segment["text"] for segment in segments).strip()
+    if not transcript:
+        raise RuntimeError("faster-whisper returned an empty transcript")
+    return transcript
 def _extract_context_meeting_ids(context_docs, limit: int = 3, user_query: str = ""):
     meeting_ids = []
     if not isinstance(context_docs, list):
@@ -587,6 +724,114 @@ def _inject_meeting_tags(reply: str, context_docs, limit: int = 3, user_query: s
     return reply.rstrip() + "\n" + tags
 
 
+def _parse_chat_request(data):
+    if not isinstance(data, dict):
+        data = {}
+
+    message = data.get('message', '')
+    history = data.get('history', [])
+    n_results = data.get('n_results', 5)
+
+    if not isinstance(message, str) or len(message.strip()) == 0:
+        return None, "Missing or empty 'message' field"
+
+    if not isinstance(history, list):
+        return None, "'history' must be a list"
+
+    if not isinstance(n_results, int) or n_results <= 0:
+        n_results = 5
+
+    options, options_error = normalize_generation_options(data)
+    if options_error:
+        return None, options_error
+
+    return {"message": message, "history": history, "n_results": n_results, "options": options}, None
+
+
+def _retrieve_chat_context(message: str, n_results: int, timings: dict = None):
+    retrieval_started = time.perf_counter()
+    # One query embedding shared by the general and the public-meeting search
+    search_results = chroma_service.query_documents_multi(message, [
+        {"n_results": n_results},
+        {"n_results": n_results, "where": {"$and": [{"source": "meeting"}, {"visibility": "public"}]}},
+    ])
+
+    docs_by_id = {}
+    anonymous_docs = []
+    for result in search_results:
+        if not isinstance(result, dict) or result.get('status') != 'success':
+            continue
+        for doc in result.get('results', []):
+            if not isinstance(doc, dict):
+                continue
+            doc_id = str(doc.get('id', ''))
+            if not doc_id:
+                anonymous_docs.append(doc)
+            elif doc_id not in docs_by_id or _get_doc_similarity(doc) > _get_doc_similarity(docs_by_id[doc_id]):
+                docs_by_id[doc_id] = doc
+
+    merged_docs = list(docs_by_id.values()) + anonymous_docs
+    merged_docs.sort(key=_get_doc_similarity, reverse=True)
+
+    retrieval_seconds = time.perf_counter() - retrieval_started
+    metrics.observe("chat_retrieval_seconds", retrieval_seconds)
+    if timings is not None:
+        timings["retrieval_seconds"] = retrieval_seconds
+    return merged_docs
+
+
+def _finalize_chat_reply(reply: str, context_docs, user_query: str) -> str:
+    # <think> spans are already removed by openvino_chat's ThinkingFilter
+    reply = reply.strip()
+    reply = _inject_classroom_tags(reply, context_docs, 3, user_query)
+    reply = _inject_meeting_tags(reply, context_docs, 3, user_query)
+    return reply
+
+
+def _context_doc_ids(context_docs) -> list:
+    return [str(doc.get('id')) for doc in context_docs if isinstance(doc, dict) and doc.get('id')]
+
+
+def _sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+def _timing_requested() -> bool:
+    return CHAT_TIMING_HEADER or request.headers.get('X-Chat-Timing') == '1'
+
+
+def _finish_request_timings(timings: dict, request_started: float) -> dict:
+    timings["request_seconds"] = time.perf_counter() - request_started
+    metrics.observe("chat_request_seconds", timings["request_seconds"])
+    return {key: round(value, 4) for key, value in timings.items() if isinstance(value, (int, float))}
+
+
+def _server_timing_header(timings: dict) -> str:
+    """Format chat timings as a Server-Timing header (durations in milliseconds)."""
+    parts = []
+    for key, name in (("retrieval_seconds", "retrieval"), ("queue_wait_seconds", "queue"),
+                      ("ttft_seconds", "ttft"), ("generation_seconds", "generation"),
+                      ("request_seconds", "total")):
+        if key in timings:
+            parts.append(f"{name};dur={timings[key] * 1000:.1f}")
+    if "prompt_tokens" in timings:
+        parts.append(f'prompt;desc="{int(timings["prompt_tokens"])} tokens"')
+    if "decode_tokens_per_second" in timings:
+        parts.append(f'decode;desc="{timings["decode_tokens_per_second"]:.1f} tok/s"')
+    return ", ".join(parts)
+
+
 @application.route('/api/chat', methods=['POST'])
 def chat():
     """
@@ -595,67 +840,241 @@ def chat():
     {
         "message": "user message",
         "history": [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}],
-        "n_results": 5
+        "n_results": 5,
+        "max_new_tokens": 64,  // optional, capped by OPENVINO_MAX_NEW_TOKENS_CAP
+        "temperature": 0.2,  // optional, capped by OPENVINO_MAX_TEMPERATURE
+        "stop": ["\n\n"]  // optional stop sequences
     }
+
+    Send "X-Chat-Timing: 1" (or set CHAT_TIMING_HEADER=true) to get a
+    Server-Timing response header with the latency breakdown.
     """
     try:
-        data = request.json or {}
-        message = data.get('message', '')
-        history = data.get('history', [])
-        n_results = data.get('n_results', 5)
+        request_started = time.perf_counter()
+        timings = {}
+        chat_request, parse_error = _parse_chat_request(request.get_json(silent=True))
+        if parse_error:
+            return jsonify({"status": "error", "message": parse_error}), 400
+
+        message = chat_request["message"]
+        history = chat_request["history"]
+        merged_docs = _retrieve_chat_context(message, chat_request["n_results"], timings)
+        doc_ids = _context_doc_ids(merged_docs)
+
+        options = chat_request["options"]
+
+        # The cache holds the model's reply before tag injection, so cached and
+        # fresh replies go through _finalize_chat_reply the same way
+        raw_reply = chat_response_cache.get(message, history, doc_ids, options) if CHAT_CACHE_ENABLED else None
+        cached = raw_reply is not None
+        if not cached:
+            messages = history + [{"role": "user", "content": message}]
+            generation_started = time.perf_counter()
+            raw_reply = generate_reply(messages, merged_docs, request.remote_addr, options, timings)
+            if CHAT_CACHE_ENABLED:
+                chat_response_cache.put(message, history, doc_ids, raw_reply,
+                                        time.perf_counter() - generation_started, options)
+        reply = _finalize_chat_reply(raw_reply, merged_docs, message)
+
+        response = jsonify({
+            "status": "success",
+            "reply": reply,
+            "context": merged_docs,
+            "cached": cached
+        })
+        timings = _finish_request_timings(timings, request_started)
+        if _timing_requested():
+            response.headers['Server-Timing'] = _server_timing_header(timings)
+        return response, 200
+    except InferenceQueueFullError as e:
+        return _chat_busy_response(e)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        if not isinstance(message, str) or len(message.strip()) == 0:
-            return jsonify({"status": "error", "message": "Missing or empty 'message' field"}), 400
 
-        if not isinstance(history, list):
-            return jsonify({"status": "error", "message": "'history' must be a list"}), 400
+def _chat_busy_response(error):
+    response = jsonify({"status": "error", "message": str(error)})
+    response.headers['Retry-After'] = '5'
+    return response, 503
 
-        if not isinstance(n_results, int) or n_results <= 0:
-            n_results = 5
 
-        query_result = chroma_service.query_documents(message, n_results)
-        meeting_query_result = chroma_service.query_documents(
-            message,
-            n_results,
-            where={"source": "meeting", "visibility": "public"}
-        )
+@application.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat using Server-Sent Events.
+    Accepts the same JSON body as /api/chat and emits:
+      - "token" events: {"token": "..."} as the model produces text, with
+        <think> spans already filtered out (a cache hit replays the stored
+        model text as a single token event)
+      - one final "done" event: {"status": "success", "reply": "...", "context": [...]}
+        where reply has thinking removed and classroom/meeting tags injected
+      - an "error" event instead of "done" if generation fails
+    Retrieval runs and generation is queued before the stream opens, so a full
+    inference queue is still answered with 503 and Retry-After.
+    With "X-Chat-Timing: 1" (or CHAT_TIMING_HEADER=true) the "done" event also
+    carries a "timings" object, since headers are sent before generation.
+    """
+    request_started = time.perf_counter()
+    chat_request, parse_error = _parse_chat_request(request.get_json(silent=True))
+    if parse_error:
+        return jsonify({"status": "error", "message": parse_error}), 400
+
+    client_key = request.remote_addr
+    include_timings = _timing_requested()
+    timings = {}
+    message = chat_request["message"]
+    history = chat_request["history"]
+    options = chat_request["options"]
+    try:
+        merged_docs = _retrieve_chat_context(message, chat_request["n_results"], timings)
+        doc_ids = _context_doc_ids(merged_docs)
+        raw_reply = chat_response_cache.get(message, history, doc_ids, options) if CHAT_CACHE_ENABLED else None
+        cached = raw_reply is not None
+        tokens = None
+        if not cached:
+            messages = history + [{"role": "user", "content": message}]
+            generation_started = time.perf_counter()
+            tokens = generate_reply_stream(messages, merged_docs, client_key, options, timings)
+    except InferenceQueueFullError as e:
+        return _chat_busy_response(e)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    def event_stream():
+        nonlocal raw_reply, timings
+        try:
+            if cached:
+                yield _sse_event("token", {"token": raw_reply})
+            else:
+                parts = []
+                for token in tokens:
+                    parts.append(token)
+                    yield _sse_event("token", {"token": token})
+
+                raw_reply = "".join(parts)
+                if CHAT_CACHE_ENABLED:
+                    chat_response_cache.put(message, history, doc_ids, raw_reply,
+                                            time.perf_counter() - generation_started, options)
+            reply = _finalize_chat_reply(raw_reply, merged_docs, message)
+
+            done = {
+                "status": "success",
+                "reply": reply,
+                "context": merged_docs,
+                "cached": cached
+            }
+            timings = _finish_request_timings(timings, request_started)
+            if include_timings:
+                done["timings"] = timings
+            yield _sse_event("done", done)
+        except Exception as e:
+            yield _sse_event("error", {"status": "error", "message": str(e)})
+        finally:
+            if tokens is not None:
+                # Stops generation when the client disconnects mid-stream
+                tokens.close()
+
+    return _sse_response(event_stream())
 
-        context_docs = []
-        if isinstance(query_result, dict) and query_result.get('status') == 'success':
-            context_docs = query_result.get('results', [])
-
-        meeting_context_docs = []
-        if isinstance(meeting_query_result, dict) and meeting_query_result.get('status') == 'success':
-            meeting_context_docs = meeting_query_result.get('results', [])
-
-        merged_docs = []
-        seen_doc_ids = set()
-        for source_docs in [context_docs, meeting_context_docs]:
-            for doc in source_docs:
-                if not isinstance(doc, dict):
-                    continue
-                doc_id = str(doc.get('id', ''))
-                if doc_id and doc_id in seen_doc_ids:
-                    continue
-                if doc_id:
-                    seen_doc_ids.add(doc_id)
-                merged_docs.append(doc)
-
-        messages = history + [{"role": "user", "content": message}]
-        reply = generate_reply(messages, merged_docs)
-        reply = _strip_model_thinking(reply)
-        reply = _inject_classroom_tags(reply, merged_docs, 3, message)
-        reply = _inject_meeting_tags(reply, merged_docs, 3, message)
 
+@application.route('/api/chat/status', methods=['GET'])
+def chat_status():
+    """Report how chat inference is running (in-process or worker pool) and its queue depth."""
+    try:
         return jsonify({
             "status": "success",
-            "reply": reply,
-            "context": merged_docs
+            **get_inference_stats(),
+            "response_cache": chat_response_cache.stats(),
+            "embedding_cache": chroma_service.get_embedding_cache_stats(),
+            "transcription_jobs": _transcription_queue().stats()
+            if transcription_queue_started() else None,
+            "transcript_cache": transcript_cache.stats() if TRANSCRIPT_CACHE_ENABLED else None,
+            "whisper_pool": _FASTER_WHISPER_POOL.stats() if _FASTER_WHISPER_POOL is not None else None,
         }), 200
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@application.route('/api/metrics', methods=['GET'])
+def chat_metrics():
+    """
+    Chat latency histograms: retrieval time, prompt tokens, queue wait,
+    time-to-first-token, generation time and decode tokens/sec.
+    Use ?format=prometheus for the Prometheus text format.
+    """
+    if request.args.get('format') == 'prometheus':
+        return Response(metrics.REGISTRY.to_prometheus(), mimetype='text/plain; version=0.0.4')
+    return jsonify({"status": "success", "histograms": metrics.REGISTRY.snapshot()}), 200
+
+
+@application.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """
+    Per-component readiness. Returns 503 while a startup warm-up is still
+    loading models; components that failed to load are reported but do not
+    make the API unready, since non-chat endpoints keep working.
+    """
+    components = {
+        "chat_model": get_chat_model_readiness(),
+        "faster_whisper": dict(_FASTER_WHISPER_READINESS),
+    }
+    collection_info = chroma_service.get_collection_info()
+    components["chromadb"] = {
+        "state": "ready" if collection_info.get('status') == 'success' else "error",
+        "document_count": collection_info.get('document_count'),
+        "error": collection_info.get('message') if collection_info.get('status') != 'success' else None,
+        "registry": get_chroma_registry_stats(),
+        "index_queue": get_index_queue().stats() if index_queue_started() else None,
+    }
+
+    warming_up = _WARMUP_STATE["started"] and not _WARMUP_STATE["finished"]
+    if warming_up:
+        status = "starting"
+    elif any(component.get("state") == "error" for component in components.values()):
+        status = "degraded"
+    else:
+        status = "ready"
+
+    return jsonify({
+        "status": status,
+        "ready": not warming_up,
+        "warmup": dict(_WARMUP_STATE),
+        "components": components,
+    }), 503 if warming_up else 200
+
+
+def _read_transcription_upload():
+    """Return (upload, None) or (None, error response) for a transcription request."""
+    audio_file = request.files.get('audio') or request.files.get('file') or request.files.get('recording')
+    if audio_file is None:
+        return None, (jsonify({
+            "status": "error",
+            "message": "Missing 'audio' file in form data",
+            "received_file_keys": list(request.files.keys()),
+            "content_type": request.content_type,
+        }), 400)
+
+    audio_bytes = audio_file.read()
+    if not audio_bytes:
+        return None, (jsonify({"status": "error", "message": "Uploaded audio file is empty"}), 400)
+    if len(audio_bytes) > TRANSCRIBE_MAX_AUDIO_BYTES:
+        return None, (jsonify({
+            "status": "error",
+            "message": f"Audio file too large. Max size is {TRANSCRIBE_MAX_AUDIO_BYTES} bytes"
+        }), 413)
+
+    return {
+        "audio_bytes": audio_bytes,
+        "hotwords": (request.form.get('hotwords') or '').strip(),
+        "mime_type": _guess_uploaded_mime_type(audio_file),
+    }, None
+
+
+def _job_mode_requested() -> bool:
+    value = request.form.get('async') or request.args.get('async') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+
 @application.route('/api/chat/transcribe', methods=['POST'])
 def transcribe_chat_audio():
     """
@@ -663,42 +1082,135 @@ def transcribe_chat_audio():
     Expected multipart/form-data:
       - audio: uploaded audio/video file blob
       - hotwords: optional comma-separated context words
+      - async: optional "true" to queue a background job and return 202 with
+        a job_id to poll at /api/chat/transcribe/jobs/<job_id>
+    Recordings longer than TRANSCRIBE_MAX_AUDIO_SECONDS are rejected with 413.
     """
     try:
-        audio_file = request.files.get('audio') or request.files.get('file') or request.files.get('recording')
-        if audio_file is None:
-            return jsonify({
-                "status": "error",
-                "message": "Missing 'audio' file in form data",
-                "received_file_keys": list(request.files.keys()),
-                "content_type": request.content_type,
-            }), 400
-
-        audio_bytes = audio_file.read()
-        if not audio_bytes:
-            return jsonify({"status": "error", "message": "Uploaded audio file is empty"}), 400
-        if len(audio_bytes) > TRANSCRIBE_MAX_AUDIO_BYTES:
+        upload, upload_error = _read_transcription_upload()
+        if upload_error:
+            return upload_error
+
+        if _job_mode_requested():
+            job = _transcription_queue().submit(
+                upload["audio_bytes"], upload["hotwords"]
+            )
             return jsonify({
-                "status": "error",
-                "message": f"Audio file too large. Max size is {TRANSCRIBE_MAX_AUDIO_BYTES} bytes"
-            }), 413
+                "status": "success",
+                "job_id": job.id,
+                "state": job.state,
+                "status_url": f"/api/chat/transcribe/jobs/{job.id}",
+            }), 202
 
-        hotwords = (request.form.get('hotwords') or '').strip()
-        mime_type = _guess_uploaded_mime_type(audio_file)
-        transcript = _transcribe_with_faster_whisper(audio_bytes, mime_type, hotwords)
+        transcript = _transcribe_with_faster_whisper(upload["audio_bytes"], upload["mime_type"], upload["hotwords"])
         return jsonify({
             "status": "success",
             "transcript": transcript,
             "engine": "faster-whisper",
         }), 200
+    except (TranscriptionQueueFullError, WhisperPoolBusyError) as e:
+        response = jsonify({"status": "error", "message": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    except audio_prep.AudioTooLongError as e:
+        return jsonify({"status": "error", "message": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except RuntimeError as e:
         return jsonify({
             "status": "error",
-            "message": f"Local transcription unavailable: {e}. Install faster-whisper and ffmpeg."
+            "message": f"Local transcription unavailable: {e}. Install faster-whisper."
         }), 500
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+
+@application.route('/api/chat/transcribe/stream', methods=['POST'])
+def transcribe_chat_audio_stream():
+    """
+    Streaming variant of /api/chat/transcribe using Server-Sent Events.
+    Accepts the same multipart body and emits:
+      - "segment" events: {"start": 0.0, "end": 2.4, "text": "..."} as each
+        segment decodes
+      - one final "done" event: {"status": "success", "transcript": "...", "engine": "faster-whisper"}
+      - an "error" event instead of "done" if decoding fails
+    """
+    upload, upload_error = _read_transcription_upload()
+    if upload_error:
+        return upload_error
+
+    def event_stream():
+        texts = []
+        try:
+            for segment in _iter_faster_whisper_segments(upload["audio_bytes"], upload["hotwords"]):
+                texts.append(segment["text"])
+                yield _sse_event("segment", segment)
+            transcript = " ".join(texts).strip()
+            if not transcript:
+                raise RuntimeError("faster-whisper returned an empty transcript")
+            yield _sse_event("done", {"status": "success", "transcript": transcript, "engine": "faster-whisper"})
+        except Exception as e:
+            yield _sse_event("error", {"status": "error", "message": str(e)})
+
+    return _sse_response(event_stream())
+
+
+@application.route('/api/chat/transcribe/jobs/<job_id>', methods=['GET'])
+def get_transcription_job(job_id):
+    """
+    Poll a background transcription job. state is queued, running, done,
+    error or timeout; segments decoded so far are included while running.
+    Pass ?since=<segment_count> to only receive segments not seen yet.
+    """
+    job = _transcription_queue().get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Transcription job not found or expired"}), 404
+
+    since = request.args.get('since', default=0, type=int) or 0
+    payload = job.to_dict(since=max(0, since))
+    payload["queue_position"] = _transcription_queue().queue_position(job)
+    return jsonify({"status": "success", **payload}), 200
+
+
+@application.route('/api/chat/transcribe/jobs/<job_id>/stream', methods=['GET'])
+def stream_transcription_job(job_id):
+    """
+    Follow a background transcription job with Server-Sent Events: "state"
+    events on queued/running changes, "segment" events as segments decode,
+    then "done" (or "error") with the final job payload. ?since=N skips
+    segments the client already has.
+    """
+    job = _transcription_queue().get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Transcription job not found or expired"}), 404
+
+    seen = max(0, request.args.get('since', default=0, type=int) or 0)
+
+    def event_stream():
+        nonlocal seen
+        last_state = None
+        while True:
+            job.wait_for_update(seen, last_state, timeout=15)
+            snapshot = job.to_dict(since=seen)
+            state_changed = snapshot["state"] != last_state
+            last_state = snapshot["state"]
+            if state_changed and last_state in ("queued", "running"):
+                yield _sse_event("state", {"state": last_state})
+            for segment in snapshot["segments"]:
+                yield _sse_event("segment", segment)
+            seen = snapshot["segment_count"]
+            if snapshot["state"] == "done":
+                yield _sse_event("done", {"status": "success", **snapshot, "segments": []})
+                return
+            if snapshot["state"] in ("error", "timeout"):
+                yield _sse_event("error", {"status": "error", "message": snapshot["error"], **snapshot, "segments": []})
+                return
+            if not snapshot["segments"] and not state_changed:
+                # Keep idle proxies from closing the connection while queued
+                yield ": keep-alive\n\n"
+
+    return _sse_response(event_stream())
+
 @application.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new account"""
@@ -1962,19 +2474,9 @@ def create_post():
     db.session.add(post)
     db.session.commit()
 
-    # Index post content in ChromaDB for RAG retrieval
+    # Index post content in ChromaDB for RAG retrieval (written behind the request)
     try:
-        chroma_service.add_documents(
-            [post.content],
-            metadatas=[{
-                "source": "post",
-                "post_id": str(post.id),
-                "author": profile.name,
-                "classroom_id": str(profile.id),
-                "timestamp": post.created_at.isoformat()
-            }],
-            ids=[f"post-{post.id}"]
-        )
+        index_document(chroma_service.collection_name, *build_post_index_entry(post))
     except Exception as e:
         # Don't fail post creation if indexing fails
         application.logger.warning("Failed to index post in ChromaDB: %s", e)
@@ -2074,7 +2576,7 @@ def delete_post(post_id):
 
     # Remove from ChromaDB index (best-effort)
     try:
-        chroma_service.delete_documents([f"post-{post.id}"])
+        remove_document(chroma_service.collection_name, f"post-{post.id}")
     except Exception as e:
         application.logger.warning("Failed to remove post from ChromaDB: %s", e)
 
@@ -2444,4 +2946,6 @@ def migrate_meetings_to_invitations():
 
 
 if __name__ == '__main__':
+    if os.getenv('PENPALS_WARMUP', 'false').lower() == 'true' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_model_warmup()
     application.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,135 @@
+"""
+In-process latency histograms for the chat and transcription paths.
+
+Each histogram keeps cumulative bucket counts (Prometheus style) plus a
+window of recent samples for p50/p95. Exposed as JSON or Prometheus text by
+/api/metrics.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+RECENT_SAMPLES = 1024
+
+# name -> (buckets, description)
+HISTOGRAMS: Dict[str, Tuple[Tuple[float, ...], str]] = {
+    "chat_request_seconds": (SECONDS_BUCKETS, "Total /api/chat handling time"),
+    "chat_retrieval_seconds": (SECONDS_BUCKETS, "ChromaDB retrieval time per chat request"),
+    "chat_prompt_tokens": (TOKEN_BUCKETS, "Prompt tokens sent to the model"),
+    "chat_queue_wait_seconds": (SECONDS_BUCKETS, "Time a chat request waited for the model"),
+    "chat_ttft_seconds": (SECONDS_BUCKETS, "Time to first generated token, including queue wait"),
+    "chat_generation_seconds": (SECONDS_BUCKETS, "Model generation time per chat request"),
+    "chat_decode_tokens_per_second": (RATE_BUCKETS, "Decode throughput per generation"),
+    "transcribe_queue_wait_seconds": (SECONDS_BUCKETS, "Time a transcription waited for a Whisper model"),
+    "transcribe_seconds": (SECONDS_BUCKETS, "Time a transcription held a Whisper model"),
+}
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Histogram:
+    def __init__(self, name: str, buckets: Iterable[float], description: str = ""):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._bucket_counts = [0] * len(self.buckets)
+        self._recent: deque = deque(maxlen=RECENT_SAMPLES)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        value = float(value)
+        with self._lock:
+            self.count += 1
+            self.total += value
+            self._recent.append(value)
+            for index, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self._bucket_counts[index] += 1
+                    break
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._recent)
+            cumulative, running = {}, 0
+            for upper, count in zip(self.buckets, self._bucket_counts):
+                running += count
+                cumulative[str(upper)] = running
+            cumulative["+Inf"] = self.count
+            return {
+                "description": self.description,
+                "count": self.count,
+                "sum": round(self.total, 6),
+                "avg": (self.total / self.count) if self.count else None,
+                "p50": _percentile(recent, 0.50),
+                "p95": _percentile(recent, 0.95),
+                "max": recent[-1] if recent else None,
+                "buckets": cumulative,
+            }
+
+
+class MetricsRegistry:
+    def __init__(self, definitions: Dict[str, Tuple[Tuple[float, ...], str]]):
+        self._lock = threading.Lock()
+        self._definitions = dict(definitions)
+        self._histograms: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str) -> Histogram:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                buckets, description = self._definitions.get(name, (SECONDS_BUCKETS, ""))
+                histogram = Histogram(name, buckets, description)
+                self._histograms[name] = histogram
+            return histogram
+
+    def observe(self, name: str, value: Optional[float]):
+        if value is None:
+            return
+        self.histogram(name).observe(value)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        for name in self._definitions:
+            self.histogram(name)
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return {histogram.name: histogram.snapshot() for histogram in histograms}
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, snapshot in self.snapshot().items():
+            metric = f"penpals_{name}"
+            if snapshot["description"]:
+                lines.append(f"# HELP {metric} {snapshot['description']}")
+            lines.append(f"# TYPE {metric} histogram")
+            for upper, count in snapshot["buckets"].items():
+                lines.append(f'{metric}_bucket{{le="{upper}"}} {count}')
+            lines.append(f"{metric}_sum {snapshot['sum']}")
+            lines.append(f"{metric}_count {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(HISTOGRAMS)
+
+
+def observe(name: str, value: Optional[float]):
+    REGISTRY.observe(name, value)
+
+
+def observe_timings(timings: Dict[str, Any]):
+    """Record a per-request timings dict whose keys match chat_<key> histograms."""
+    for key, value in timings.items():
+        name = f"chat_{key}"
+        if name in HISTOGRAMS and isinstance(value, (int, float)):
+            REGISTRY.observe(name, value)
@@ -1,7 +1,16 @@
+import hashlib
+import json
+import math
 import os
 import threading
 import queue
-from typing import Any, Dict, Iterable, List
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import inference_worker
+import metrics
 
 try:
     import openvino_genai as ov_genai
@@ -12,13 +21,112 @@ DEFAULT_MODEL_DIR = os.getenv(
     "OPENVINO_MODEL_DIR",
     "..\\..\\models\\qwen3-1.7b-int4-ov",
 )
+# Optional much smaller model of the same family (e.g. qwen3-0.6b-int4-ov) used
+# as the draft for speculative decoding. Leave unset for normal decoding.
+DRAFT_MODEL_DIR = os.getenv("OPENVINO_DRAFT_MODEL_DIR", "")
+NUM_ASSISTANT_TOKENS = int(os.getenv("OPENVINO_NUM_ASSISTANT_TOKENS", "5"))
 
 MAX_NEW_TOKENS = int(os.getenv("OPENVINO_MAX_NEW_TOKENS", "256"))
 TEMPERATURE = float(os.getenv("OPENVINO_TEMPERATURE", "0.7"))
 TOP_P = float(os.getenv("OPENVINO_TOP_P", "0.9"))
+MAX_NEW_TOKENS_CAP = int(os.getenv("OPENVINO_MAX_NEW_TOKENS_CAP", str(MAX_NEW_TOKENS)))
+MAX_TEMPERATURE = float(os.getenv("OPENVINO_MAX_TEMPERATURE", "1.5"))
+MAX_STOP_SEQUENCES = int(os.getenv("OPENVINO_MAX_STOP_SEQUENCES", "4"))
+MAX_STOP_SEQUENCE_LENGTH = 32
+
+BATCH_MAX_SIZE = int(os.getenv("OPENVINO_BATCH_MAX_SIZE", "4"))
+BATCH_WAIT_MS = float(os.getenv("OPENVINO_BATCH_WAIT_MS", "10"))
+REQUEST_DEADLINE_SECONDS = float(os.getenv("OPENVINO_REQUEST_DEADLINE_SECONDS", "120"))
+CONTINUOUS_BATCHING = os.getenv("OPENVINO_CONTINUOUS_BATCHING", "false").lower() == "true"
+KV_CACHE_SIZE_GB = int(os.getenv("OPENVINO_KV_CACHE_SIZE_GB", "2"))
+PREFIX_CACHING = os.getenv("OPENVINO_PREFIX_CACHING", "false").lower() == "true"
+PREFIX_CACHE_ENTRIES = int(os.getenv("OPENVINO_PREFIX_CACHE_ENTRIES", "256"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("OPENVINO_PROMPT_TOKEN_BUDGET", "2048"))
+CHARS_PER_TOKEN_ESTIMATE = 4.0
+# Qwen3 reasons in a <think> block before answering unless told not to. Those
+# tokens cost full decode time and eat into max_new_tokens, so by default the
+# prompt carries Qwen3's /no_think switch and any stray block is filtered out.
+THINKING_ENABLED = os.getenv("OPENVINO_ENABLE_THINKING", "false").lower() == "true"
+NO_THINK_SWITCH = "/no_think"
+# Once a conversation has more than HISTORY_SUMMARY_MIN_TURNS earlier turns,
+# everything but the last HISTORY_RECENT_TURNS is replaced by a cached
+# summary, so long sessions stop growing the prompt. Off by default: the
+# summaries are extra generations on the pipeline user requests also use.
+HISTORY_SUMMARY_ENABLED = os.getenv("OPENVINO_HISTORY_SUMMARY", "false").lower() == "true"
+HISTORY_SUMMARY_MIN_TURNS = int(os.getenv("OPENVINO_HISTORY_SUMMARY_MIN_TURNS", "12"))
+HISTORY_RECENT_TURNS = int(os.getenv("OPENVINO_HISTORY_RECENT_TURNS", "6"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("OPENVINO_HISTORY_SUMMARY_MAX_TOKENS", "160"))
+HISTORY_SUMMARY_CACHE_ENTRIES = int(os.getenv("OPENVINO_HISTORY_SUMMARY_CACHE_ENTRIES", "256"))
+HISTORY_SUMMARY_CHUNK = 4
+
+SYSTEM_PROMPT = (
+    "You are the PenPals assistant. Use the provided context when it is relevant. "
+    "If the context is missing or does not help, answer based on general knowledge "
+    "and say you are not sure when appropriate. Keep responses concise and helpful."
+)
 
 _PIPELINE_LOCK = threading.Lock()
 _PIPELINE = None
+_READINESS: Dict[str, Any] = {"state": "idle", "load_seconds": None, "error": None}
+_TOKENIZER_LOCK = threading.Lock()
+_TOKENIZER = None
+_THINKING_LOCK = threading.Lock()
+_THINKING_STATS = {"filtered_replies": 0, "filtered_chars": 0}
+_SPECULATIVE: Dict[str, Any] = {"active": False, "draft_model_dir": None, "fallback_reason": None}
+
+
+def _draft_model_kwargs() -> Dict[str, Any]:
+    """LLMPipeline kwargs for speculative decoding, or {} to decode normally."""
+    _SPECULATIVE.update(active=False, draft_model_dir=None, fallback_reason=None)
+    if not DRAFT_MODEL_DIR:
+        return {}
+    if not os.path.isdir(DRAFT_MODEL_DIR):
+        _SPECULATIVE["fallback_reason"] = f"Draft model directory not found: {DRAFT_MODEL_DIR}"
+        return {}
+    if not hasattr(ov_genai, "draft_model"):
+        _SPECULATIVE["fallback_reason"] = "Installed openvino_genai does not support speculative decoding"
+        return {}
+    _SPECULATIVE.update(active=True, draft_model_dir=DRAFT_MODEL_DIR)
+    return {"draft_model": ov_genai.draft_model(DRAFT_MODEL_DIR, "CPU")}
+
+
+def _create_pipeline(pipeline_kwargs: Dict[str, Any]):
+    if (CONTINUOUS_BATCHING or PREFIX_CACHING) and hasattr(ov_genai, "SchedulerConfig"):
+        # Paged-attention backend: batched prompts share one KV cache pool,
+        # and with prefix caching identical prompt prefixes reuse KV blocks.
+        scheduler_config = ov_genai.SchedulerConfig()
+        scheduler_config.cache_size = KV_CACHE_SIZE_GB
+        scheduler_config.enable_prefix_caching = PREFIX_CACHING
+        pipeline_kwargs = dict(pipeline_kwargs, scheduler_config=scheduler_config)
+    pipeline = ov_genai.LLMPipeline(DEFAULT_MODEL_DIR, "CPU", **pipeline_kwargs)
+
+    # One-token generation so kernel compilation happens here rather than
+    # on the first user request.
+    pipeline.generate("Hello", _get_generation_config(pipeline, {"max_new_tokens": 1}))
+    return pipeline
+
+
+def _load_pipeline():
+    if not os.path.isdir(DEFAULT_MODEL_DIR):
+        raise RuntimeError(
+            f"OpenVINO model directory not found: {DEFAULT_MODEL_DIR}"
+        )
+    try:
+        draft_kwargs = _draft_model_kwargs()
+    except Exception as e:
+        _SPECULATIVE.update(active=False, fallback_reason=f"Failed to load draft model: {e}")
+        draft_kwargs = {}
+    if not draft_kwargs:
+        return _create_pipeline({})
+
+    try:
+        return _create_pipeline(draft_kwargs)
+    except Exception as e:
+        # A draft model that does not match the main model's tokenizer, or a
+        # runtime without speculative support, should not take chat down.
+        print(f"Speculative decoding disabled, falling back to normal decoding: {e}")
+        _SPECULATIVE.update(active=False, fallback_reason=str(e))
+        return _create_pipeline({})
 
 
 def _get_pipeline():
@@ -30,22 +138,222 @@ def _get_pipeline():
     global _PIPELINE
     with _PIPELINE_LOCK:
         if _PIPELINE is None:
-            if not os.path.isdir(DEFAULT_MODEL_DIR):
-                raise RuntimeError(
-                    f"OpenVINO model directory not found: {DEFAULT_MODEL_DIR}"
-                )
-            _PIPELINE = ov_genai.LLMPipeline(DEFAULT_MODEL_DIR, "CPU")
+            _READINESS.update(state="loading", error=None)
+            started = time.perf_counter()
+            try:
+                _PIPELINE = _load_pipeline()
+            except Exception as e:
+                _READINESS.update(state="error", error=str(e))
+                raise
+            _READINESS.update(state="ready", load_seconds=round(time.perf_counter() - started, 3))
         return _PIPELINE
 
 
-def _get_generation_config(pipeline):
+def warm_up() -> Dict[str, Any]:
+    """Load the model (in this process or in every worker) and prime it with a one-token generation."""
+    if inference_worker.worker_pool_enabled():
+        inference_worker.get_worker_pool().warm_up()
+    else:
+        _get_pipeline()
+    return get_readiness()
+
+
+def get_readiness() -> Dict[str, Any]:
+    if inference_worker.worker_pool_enabled():
+        if inference_worker.pool_started():
+            return inference_worker.get_worker_pool().readiness()
+        return {"state": "idle", "load_seconds": None, "error": None}
+    return dict(_READINESS)
+
+
+def normalize_generation_options(raw: Dict[str, Any]):
+    """
+    Validate client-supplied generation parameters and clamp them to the
+    server caps. Returns (options, error) where options only holds the keys
+    the client actually set.
+    """
+    options: Dict[str, Any] = {}
+    if not isinstance(raw, dict):
+        return options, None
+
+    max_new_tokens = raw.get("max_new_tokens")
+    if max_new_tokens is not None:
+        if isinstance(max_new_tokens, bool) or not isinstance(max_new_tokens, int) or max_new_tokens <= 0:
+            return None, "'max_new_tokens' must be a positive integer"
+        options["max_new_tokens"] = min(max_new_tokens, MAX_NEW_TOKENS_CAP)
+
+    temperature = raw.get("temperature")
+    if temperature is not None:
+        if isinstance(temperature, bool) or not isinstance(temperature, (int, float)) or temperature < 0:
+            return None, "'temperature' must be a non-negative number"
+        options["temperature"] = min(float(temperature), MAX_TEMPERATURE)
+
+    stop = raw.get("stop")
+    if stop is not None:
+        if isinstance(stop, str):
+            stop = [stop]
+        if not isinstance(stop, list) or not all(isinstance(item, str) and item for item in stop):
+            return None, "'stop' must be a string or a list of non-empty strings"
+        if len(stop) > MAX_STOP_SEQUENCES:
+            return None, f"'stop' accepts at most {MAX_STOP_SEQUENCES} sequences"
+        if any(len(item) > MAX_STOP_SEQUENCE_LENGTH for item in stop):
+            return None, f"Stop sequences must be at most {MAX_STOP_SEQUENCE_LENGTH} characters"
+        options["stop"] = sorted(set(stop))
+
+    return options, None
+
+
+def _options_key(options: Optional[Dict[str, Any]]) -> Tuple:
+    options = options or {}
+    return (
+        options.get("max_new_tokens", MAX_NEW_TOKENS),
+        options.get("temperature", TEMPERATURE),
+        tuple(options.get("stop", ())),
+    )
+
+
+def _get_generation_config(pipeline, options: Optional[Dict[str, Any]] = None):
+    """
+    Per-request config. get_generation_config() returns a copy of the
+    pipeline's config, so the model's generation_config.json defaults (top_k,
+    min_p, eos and stop tokens, ...) carry over and the shared one is untouched.
+    """
+    options = options or {}
     config = pipeline.get_generation_config()
-    config.max_new_tokens = MAX_NEW_TOKENS
-    config.temperature = TEMPERATURE
+
+    temperature = options.get("temperature", TEMPERATURE)
+    config.max_new_tokens = options.get("max_new_tokens", MAX_NEW_TOKENS)
+    config.temperature = temperature
     config.top_p = TOP_P
+    config.do_sample = temperature > 0
+    if options.get("stop"):
+        config.stop_strings = set(options["stop"])
+    if _SPECULATIVE["active"]:
+        # The draft proposes this many tokens per step; the main model
+        # verifies them in a single forward pass.
+        config.num_assistant_tokens = NUM_ASSISTANT_TOKENS
     return config
 
 
+def _system_text() -> str:
+    if THINKING_ENABLED:
+        return f"{SYSTEM_PROMPT}\n\n"
+    return f"{SYSTEM_PROMPT} {NO_THINK_SWITCH}\n\n"
+
+
+class ThinkingFilter:
+    """
+    Drop <think>...</think> spans from a token stream as it arrives.
+
+    Tags may be split across tokens, so text that could be the start of a tag
+    is held back until the next token decides it. Leading whitespace left
+    behind by a removed block is trimmed.
+    """
+
+    OPEN_TAGS = ("<think>", "<thinking>")
+    CLOSE_TAGS = ("</think>", "</thinking>")
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+        self._trim_leading = True
+        self.dropped_chars = 0
+
+    @staticmethod
+    def _find(text: str, tags: Tuple[str, ...]) -> Tuple[int, int]:
+        lowered = text.lower()
+        best = (-1, 0)
+        for tag in tags:
+            index = lowered.find(tag)
+            if index != -1 and (best[0] == -1 or index < best[0]):
+                best = (index, len(tag))
+        return best
+
+    @staticmethod
+    def _partial_tag_length(text: str, tags: Tuple[str, ...]) -> int:
+        lowered = text.lower()
+        for length in range(min(len(lowered), max(len(tag) for tag in tags) - 1), 0, -1):
+            if any(tag.startswith(lowered[-length:]) for tag in tags):
+                return length
+        return 0
+
+    def _emit(self, text: str) -> str:
+        if self._trim_leading:
+            text = text.lstrip()
+            if text:
+                self._trim_leading = False
+        return text
+
+    def feed(self, token: str) -> str:
+        self._buffer += token
+        output = []
+        while self._buffer:
+            if self._inside:
+                index, length = self._find(self._buffer, self.CLOSE_TAGS)
+                if index == -1:
+                    held = self._partial_tag_length(self._buffer, self.CLOSE_TAGS)
+                    self.dropped_chars += len(self._buffer) - held
+                    self._buffer = self._buffer[len(self._buffer) - held:]
+                    break
+                self.dropped_chars += index + length
+                self._buffer = self._buffer[index + length:]
+                self._inside = False
+                self._trim_leading = True
+            else:
+                index, length = self._find(self._buffer, self.OPEN_TAGS)
+                if index == -1:
+                    held = self._partial_tag_length(self._buffer, self.OPEN_TAGS)
+                    output.append(self._emit(self._buffer[:len(self._buffer) - held]))
+                    self._buffer = self._buffer[len(self._buffer) - held:]
+                    break
+                output.append(self._emit(self._buffer[:index]))
+                self.dropped_chars += length
+                self._buffer = self._buffer[index + length:]
+                self._inside = True
+        return "".join(output)
+
+    def flush(self) -> str:
+        """Return held-back text at end of stream; an unclosed think block is dropped."""
+        remaining, self._buffer = self._buffer, ""
+        if self._inside:
+            self.dropped_chars += len(remaining)
+            return ""
+        return self._emit(remaining)
+
+
+def _record_thinking(dropped_chars: int):
+    if not dropped_chars:
+        return
+    with _THINKING_LOCK:
+        _THINKING_STATS["filtered_replies"] += 1
+        _THINKING_STATS["filtered_chars"] += dropped_chars
+
+
+def strip_thinking(text: str) -> str:
+    thinking_filter = ThinkingFilter()
+    visible = thinking_filter.feed(text) + thinking_filter.flush()
+    _record_thinking(thinking_filter.dropped_chars)
+    return visible
+
+
+def _filter_thinking_stream(tokens: Iterable[str]) -> Iterable[str]:
+    thinking_filter = ThinkingFilter()
+    try:
+        for token in tokens:
+            visible = thinking_filter.feed(token)
+            if visible:
+                yield visible
+        tail = thinking_filter.flush()
+        if tail:
+            yield tail
+    finally:
+        _record_thinking(thinking_filter.dropped_chars)
+        close = getattr(tokens, "close", None)
+        if close is not None:
+            # Propagate client disconnects so generation stops early.
+            close()
+
+
 def _format_context(context_docs: List[Dict[str, Any]]) -> str:
     if not context_docs:
         return "Context: (none)"
@@ -59,7 +367,7 @@ def _format_context(context_docs: List[Dict[str, Any]]) -> str:
     return "\n".join(lines)
 
 
-def _format_history(messages: List[Dict[str, str]]) -> str:
+def _format_turns(messages: List[Dict[str, str]]) -> List[str]:
     lines = []
     for message in messages:
         role = message.get("role", "user")
@@ -68,52 +376,884 @@ def _format_history(messages: List[Dict[str, str]]) -> str:
             lines.append(f"Assistant: {content}")
         else:
             lines.append(f"User: {content}")
-    lines.append("Assistant:")
-    return "\n".join(lines)
+    return lines
 
 
-def build_prompt(messages: List[Dict[str, str]], context_docs: List[Dict[str, Any]]) -> str:
-    system = (
-        "You are the PenPals assistant. Use the provided context when it is relevant. "
-        "If the context is missing or does not help, answer based on general knowledge "
-        "and say you are not sure when appropriate. Keep responses concise and helpful."
-    )
-    context = _format_context(context_docs)
-    history = _format_history(messages)
-    return f"{system}\n\n{context}\n\n{history}"
+def _format_history(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(_format_turns(messages) + ["Assistant:"])
 
 
-def generate_reply(messages: List[Dict[str, str]], context_docs: List[Dict[str, Any]]) -> str:
-    pipeline = _get_pipeline()
-    prompt = build_prompt(messages, context_docs)
-    config = _get_generation_config(pipeline)
-    return pipeline.generate(prompt, config)
+def _get_tokenizer():
+    """Load the model tokenizer once; None if it is unavailable (counts fall back to estimates)."""
+    global _TOKENIZER
+    with _TOKENIZER_LOCK:
+        if _TOKENIZER is None:
+            _TOKENIZER = False
+            if ov_genai is not None and os.path.isdir(DEFAULT_MODEL_DIR):
+                try:
+                    _TOKENIZER = ov_genai.Tokenizer(DEFAULT_MODEL_DIR)
+                except Exception as e:
+                    print(f"OpenVINO tokenizer unavailable, estimating token counts: {e}")
+        return _TOKENIZER or None
 
 
-def generate_reply_stream(
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        try:
+            return int(tokenizer.encode(text).input_ids.data.shape[-1])
+        except Exception:
+            pass
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN_ESTIMATE))
+
+
+def _select_turns(turn_lines: List[str], turn_tokens: List[int], budget: int) -> int:
+    """Return how many of the most recent turns fit in budget."""
+    used = 0
+    kept = 0
+    for tokens in reversed(turn_tokens):
+        if used + tokens > budget:
+            break
+        used += tokens
+        kept += 1
+    return kept
+
+
+def _select_docs(context_docs: List[Dict[str, Any]], doc_tokens: List[int], budget: int) -> List[int]:
+    """Pick doc indexes by descending similarity until budget is spent; keep retrieval order."""
+    def similarity(index: int) -> float:
+        try:
+            return float(context_docs[index].get("similarity", 0.0))
+        except (AttributeError, TypeError, ValueError):
+            return 0.0
+
+    chosen = []
+    used = 0
+    for index in sorted(range(len(context_docs)), key=similarity, reverse=True):
+        if used + doc_tokens[index] > budget:
+            continue
+        used += doc_tokens[index]
+        chosen.append(index)
+    return sorted(chosen)
+
+
+def _format_summary(summary: Optional[str]) -> str:
+    if not summary:
+        return ""
+    return f"Summary of the earlier conversation:\n{summary}\n\n"
+
+
+def build_prompt_parts(
     messages: List[Dict[str, str]],
     context_docs: List[Dict[str, Any]],
-) -> Iterable[str]:
-    pipeline = _get_pipeline()
-    prompt = build_prompt(messages, context_docs)
-    config = _get_generation_config(pipeline)
+    token_budget: Optional[int] = None,
+    summary: Optional[str] = None,
+    summarized_turns: int = 0,
+) -> Tuple[str, str, Dict[str, int]]:
+    """
+    Split the prompt into a reusable prefix and a per-request suffix that fit
+    the prompt token budget.
+
+    The prefix (system prompt, optional summary of older turns, then earlier
+    turns) is byte-identical across turns of a conversation, so the KV prefix
+    cache only prefills the suffix: the retrieved context, which changes every
+    message, and the new user turn. When over budget, the oldest turns are
+    dropped first and the lowest-similarity documents are trimmed first.
+    Returns the token counts used alongside the prompt.
+    """
+    budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    earlier, latest = messages[:-1], messages[-1:]
+    context_docs = [doc for doc in (context_docs or []) if isinstance(doc, dict)]
+
+    system_text = _system_text()
+    summary_text = _format_summary(summary)
+    latest_text = _format_history(latest)
+    system_tokens = count_tokens(system_text)
+    summary_tokens = count_tokens(summary_text)
+    latest_tokens = count_tokens(latest_text)
+    remaining = max(0, budget - system_tokens - summary_tokens - latest_tokens)
+
+    turn_lines = _format_turns(earlier)
+    turn_tokens = [count_tokens(line) + 1 for line in turn_lines]
+    doc_tokens = [count_tokens(_format_context([doc])) for doc in context_docs]
+
+    # History may claim up to half of the remaining budget; context gets the
+    # rest, and history then takes back whatever the context left unused.
+    history_cap = min(sum(turn_tokens), remaining // 2)
+    doc_indexes = _select_docs(context_docs, doc_tokens, remaining - history_cap)
+    context_used = sum(doc_tokens[i] for i in doc_indexes)
+    kept_turns = _select_turns(turn_lines, turn_tokens, remaining - context_used)
+
+    kept_lines = turn_lines[len(turn_lines) - kept_turns:] if kept_turns else []
+    prefix = system_text + summary_text
+    if kept_lines:
+        prefix += "\n".join(kept_lines) + "\n\n"
+    kept_docs = [context_docs[i] for i in doc_indexes]
+    suffix = f"{_format_context(kept_docs)}\n\n{latest_text}"
+
+    usage = {
+        "budget": budget,
+        "system_tokens": system_tokens,
+        "history_tokens": sum(turn_tokens[len(turn_tokens) - kept_turns:]) if kept_turns else 0,
+        "context_tokens": context_used,
+        "message_tokens": latest_tokens,
+        "summary_tokens": summary_tokens,
+        "summarized_turns": summarized_turns,
+        "dropped_turns": len(turn_lines) - kept_turns,
+        "dropped_docs": len(context_docs) - len(doc_indexes),
+    }
+    usage["prompt_tokens"] = (
+        usage["system_tokens"] + usage["summary_tokens"] + usage["history_tokens"]
+        + usage["context_tokens"] + usage["message_tokens"]
+    )
+    _PROMPT_STATS.record(usage)
+    return prefix, suffix, usage
+
+
+def build_prompt(messages: List[Dict[str, str]], context_docs: List[Dict[str, Any]]) -> str:
+    prefix, suffix, _ = build_prompt_parts(messages, context_docs)
+    return prefix + suffix
+
+
+class PromptStats:
+    """Running totals of prompt token usage for /api/chat/status."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+        self.dropped_turns = 0
+        self.dropped_docs = 0
+        self.last: Dict[str, int] = {}
+
+    def record(self, usage: Dict[str, int]):
+        with self._lock:
+            self.prompts += 1
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.max_prompt_tokens = max(self.max_prompt_tokens, usage["prompt_tokens"])
+            self.dropped_turns += usage["dropped_turns"]
+            self.dropped_docs += usage["dropped_docs"]
+            self.last = dict(usage)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget": PROMPT_TOKEN_BUDGET,
+                "tokenizer": "model" if _get_tokenizer() is not None else "estimate",
+                "prompts": self.prompts,
+                "avg_prompt_tokens": (self.prompt_tokens / self.prompts) if self.prompts else 0.0,
+                "max_prompt_tokens": self.max_prompt_tokens,
+                "dropped_turns": self.dropped_turns,
+                "dropped_docs": self.dropped_docs,
+                "last": self.last,
+            }
+
+
+_PROMPT_STATS = PromptStats()
+
+
+class DecodingStats:
+    """Generated tokens/sec and, with a draft model, the draft acceptance rate."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generations = 0
+        self.generated_tokens = 0
+        self.generate_seconds = 0.0
+        self.draft_tokens = 0
+        self.accepted_tokens = 0
+
+    @staticmethod
+    def _speculative_counts(result: Any) -> Tuple[int, int]:
+        metrics = getattr(result, "extended_perf_metrics", None)
+        draft_metrics = getattr(metrics, "draft_model_metrics", None)
+        if metrics is None or draft_metrics is None or not hasattr(metrics, "get_num_accepted_tokens"):
+            return 0, 0
+        try:
+            return draft_metrics.get_num_generated_tokens(), metrics.get_num_accepted_tokens()
+        except Exception:
+            return 0, 0
+
+    def record(self, result: Any, texts: List[str], seconds: float,
+               first_token_seconds: Optional[float] = None) -> Dict[str, float]:
+        """Update the running totals; returns this generation's ttft/decode-rate timings."""
+        timings: Dict[str, float] = {}
+        perf_metrics = getattr(result, "perf_metrics", None)
+        try:
+            tokens = perf_metrics.get_num_generated_tokens()
+            timings["decode_tokens_per_second"] = perf_metrics.get_throughput().mean
+            timings["ttft_seconds"] = perf_metrics.get_ttft().mean / 1000.0
+        except Exception:
+            tokens = sum(count_tokens(text) for text in texts)
+            decode_seconds = seconds - (first_token_seconds or 0.0)
+            if tokens and decode_seconds > 0:
+                timings["decode_tokens_per_second"] = tokens / decode_seconds
+        draft_tokens, accepted_tokens = self._speculative_counts(result)
+        with self._lock:
+            self.generations += 1
+            self.generated_tokens += tokens
+            self.generate_seconds += seconds
+            self.draft_tokens += draft_tokens
+            self.accepted_tokens += accepted_tokens
+        return timings
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "speculative": dict(_SPECULATIVE, num_assistant_tokens=NUM_ASSISTANT_TOKENS),
+                "generations": self.generations,
+                "generated_tokens": self.generated_tokens,
+                "tokens_per_second": (self.generated_tokens / self.generate_seconds)
+                if self.generate_seconds else 0.0,
+                "acceptance_rate": (self.accepted_tokens / self.draft_tokens)
+                if self.draft_tokens else None,
+            }
 
-    token_queue: "queue.Queue[str | None]" = queue.Queue()
 
-    def streamer(token: str):
-        token_queue.put(token)
+_DECODING_STATS = DecodingStats()
 
-    def run_generation():
+
+class PrefixCacheTracker:
+    """
+    LRU of prompt-prefix hashes, mirroring what the KV prefix cache can reuse.
+
+    The KV blocks themselves live inside the OpenVINO scheduler; this keeps
+    hit/miss counts so reuse is visible in /api/chat/status. Nothing is
+    recorded while OPENVINO_PREFIX_CACHING is off, since nothing is reused.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = max(1, capacity)
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.system_hits = 0
+        self.misses = 0
+        self.reused_chars = 0
+
+    @staticmethod
+    def _key(prefix: str) -> str:
+        return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+    def _touch(self, key: str, length: int):
+        self._entries[key] = length
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def record(self, prefix: str):
+        system_prefix = _system_text()
+        full_key = self._key(prefix)
+        system_key = self._key(system_prefix)
+        with self._lock:
+            if full_key in self._entries:
+                self.hits += 1
+                self.reused_chars += len(prefix)
+            elif system_key in self._entries:
+                self.system_hits += 1
+                self.reused_chars += len(system_prefix)
+            else:
+                self.misses += 1
+            self._touch(system_key, len(system_prefix))
+            self._touch(full_key, len(prefix))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.system_hits + self.misses
+            return {
+                "enabled": PREFIX_CACHING,
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "system_prompt_hits": self.system_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.system_hits) / lookups) if lookups else (0.0 if PREFIX_CACHING else None),
+                "reused_chars": self.reused_chars,
+            }
+
+
+_PREFIX_TRACKER = PrefixCacheTracker(PREFIX_CACHE_ENTRIES)
+
+
+class HistorySummarizer:
+    """
+    Rolling summaries of old conversation turns, cached by a hash of the turns.
+
+    The summarized span grows in HISTORY_SUMMARY_CHUNK steps so that a summary
+    stays valid for several requests (and keeps the prompt prefix stable). On
+    a miss the summary is built in the background from the previous cached
+    summary plus the new chunk; until it is ready the request uses the
+    closest shorter summary, or none, and the token budget trims as before.
+
+    Summaries are built one at a time on a single worker thread. A key that is
+    already queued is not queued again, at most max_pending builds wait, and
+    nothing is scheduled while is_ready() says the model is not loaded.
+    """
+
+    def __init__(self, capacity: int, generate_fn, is_ready=None, max_pending: int = 16):
+        self.capacity = max(1, capacity)
+        self.max_pending = max(1, max_pending)
+        self._generate_fn = generate_fn
+        self._is_ready = is_ready or (lambda: True)
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.built = 0
+        self.failures = 0
+        self.skipped = 0
+
+    @staticmethod
+    def _key(turns: List[Dict[str, str]]) -> str:
+        normalized = [[turn.get("role", "user"), turn.get("content", "")] for turn in turns]
+        return hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def summary_boundary(turn_count: int) -> int:
+        """How many of the oldest turns should be covered by a summary."""
+        if not HISTORY_SUMMARY_ENABLED or turn_count <= HISTORY_SUMMARY_MIN_TURNS:
+            return 0
+        return ((turn_count - HISTORY_RECENT_TURNS) // HISTORY_SUMMARY_CHUNK) * HISTORY_SUMMARY_CHUNK
+
+    def _cached(self, turns: List[Dict[str, str]], boundary: int) -> Optional[str]:
+        key = self._key(turns[:boundary])
+        summary = self._summaries.get(key)
+        if summary is not None:
+            self._summaries.move_to_end(key)
+        return summary
+
+    def _latest_cached(self, turns: List[Dict[str, str]], boundary: int) -> Tuple[Optional[str], int]:
+        for step in range(boundary, 0, -HISTORY_SUMMARY_CHUNK):
+            summary = self._cached(turns, step)
+            if summary is not None:
+                return summary, step
+        return None, 0
+
+    def apply(self, messages: List[Dict[str, str]]) -> Tuple[Optional[str], int, List[Dict[str, str]]]:
+        """Return (summary, summarized turn count, messages left to send verbatim)."""
+        earlier = messages[:-1]
+        boundary = self.summary_boundary(len(earlier))
+        if boundary <= 0:
+            return None, 0, messages
+
+        with self._lock:
+            summary = self._cached(earlier, boundary)
+            if summary is not None:
+                self.hits += 1
+                return summary, boundary, messages[boundary:]
+            self.misses += 1
+            summary, covered = self._latest_cached(earlier, boundary - HISTORY_SUMMARY_CHUNK)
+            if summary is not None:
+                self.stale_hits += 1
+            self._schedule(earlier[:boundary])
+        return summary, covered, messages[covered:]
+
+    def _schedule(self, turns: List[Dict[str, str]]):
+        key = self._key(turns)
+        if key in self._in_flight:
+            return
+        if len(self._in_flight) >= self.max_pending or not self._is_ready():
+            self.skipped += 1
+            return
+        self._in_flight.add(key)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self._executor.submit(self._build, key, turns)
+
+    def _build(self, key: str, turns: List[Dict[str, str]]):
         try:
-            pipeline.generate(prompt, config, streamer=streamer)
+            with self._lock:
+                previous, covered = self._latest_cached(turns, len(turns) - HISTORY_SUMMARY_CHUNK)
+            summary = self._fold(previous, turns[covered:])
+            with self._lock:
+                self._summaries[key] = summary
+                self._summaries.move_to_end(key)
+                while len(self._summaries) > self.capacity:
+                    self._summaries.popitem(last=False)
+                self.built += 1
+        except Exception as e:
+            print(f"History summarization failed: {e}")
+            with self._lock:
+                self.failures += 1
         finally:
-            token_queue.put(None)
+            with self._lock:
+                self._in_flight.discard(key)
 
-    thread = threading.Thread(target=run_generation, daemon=True)
-    thread.start()
+    def _fold(self, previous: Optional[str], turns: List[Dict[str, str]]) -> str:
+        """
+        Summarize turns onto previous, in as many generations as it takes to
+        keep every summary prompt (plus its output) within PROMPT_TOKEN_BUDGET.
+        A turn too long to fit on its own is cut short.
+        """
+        budget = max(1, PROMPT_TOKEN_BUDGET - HISTORY_SUMMARY_MAX_TOKENS)
+        summary = previous
+        start = 0
+        while start < len(turns):
+            available = budget - count_tokens(self._summary_prompt(summary, []))
+            end, used = start, 0
+            while end < len(turns):
+                tokens = count_tokens(_format_turns(turns[end:end + 1])[0]) + 1
+                if used + tokens > available:
+                    break
+                used += tokens
+                end += 1
+            if end == start:
+                turn = dict(turns[start])
+                max_chars = max(1, int(available * CHARS_PER_TOKEN_ESTIMATE) - 16)
+                turn["content"] = turn.get("content", "")[:max_chars]
+                chunk, end = [turn], start + 1
+            else:
+                chunk = turns[start:end]
+            summary = self._generate_fn(self._summary_prompt(summary, chunk)).strip()
+            if not summary:
+                raise RuntimeError("empty summary")
+            start = end
+        return summary or ""
 
-    while True:
-        item = token_queue.get()
-        if item is None:
-            break
-        yield item
+    @staticmethod
+    def _summary_prompt(previous: Optional[str], turns: List[Dict[str, str]]) -> str:
+        lines = [
+            "Summarize the conversation between a user and the PenPals assistant in a few "
+            "sentences. Keep names, classrooms, meetings, dates and any open questions. "
+            f"{NO_THINK_SWITCH}",
+            "",
+        ]
+        if previous:
+            lines += [f"Summary so far: {previous}", ""]
+        lines += _format_turns(turns)
+        lines += ["", "Summary:"]
+        return "\n".join(lines)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": HISTORY_SUMMARY_ENABLED,
+                "min_turns": HISTORY_SUMMARY_MIN_TURNS,
+                "recent_turns": HISTORY_RECENT_TURNS,
+                "entries": len(self._summaries),
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "built": self.built,
+                "failures": self.failures,
+                "skipped": self.skipped,
+            }
+
+
+def _decoded_texts(result: Any) -> List[str]:
+    if isinstance(result, str):
+        return [result]
+    texts = getattr(result, "texts", None)
+    if texts is not None:
+        return list(texts)
+    return [str(result)]
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a chat request waits in the queue, or generates, past its deadline."""
+
+
+class _ChatJob:
+    def __init__(self, prompt: str, client_key: str, deadline: float, stream: bool,
+                 options: Optional[Dict[str, Any]] = None):
+        self.prompt = prompt
+        self.options = options or {}
+        self.client_key = client_key
+        self.deadline = deadline
+        self.stream = stream
+        self.submitted_at = time.monotonic()
+        self.timings: Dict[str, float] = {}
+        self.done = threading.Event()
+        self.stop_event = threading.Event()
+        self.tokens: "queue.Queue[str | None]" = queue.Queue()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+    def finish(self, result: Optional[str] = None, error: Optional[BaseException] = None):
+        self.result = result
+        self.error = error
+        if self.stream:
+            self.tokens.put(None)
+        self.done.set()
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def wait(self) -> str:
+        # The scheduler moves the deadline forward when the job starts running,
+        # so re-check it instead of waiting once.
+        while not self.done.wait(self.remaining()):
+            if self.remaining() <= 0:
+                self.stop_event.set()
+                raise DeadlineExceededError("Chat generation did not finish in time, please retry")
+        if self.error is not None:
+            raise self.error
+        return self.result or ""
+
+
+class ChatScheduler:
+    """
+    Single dispatcher in front of the shared pipeline.
+
+    Pending prompts are grouped per client and drained round-robin so one busy
+    client cannot starve the others. Non-streaming prompts are generated
+    together in batches of up to max_batch_size; streaming prompts run alone,
+    so a long stream holds up every other job until it finishes. Jobs that
+    are still queued when their deadline passes, or whose caller has stopped
+    waiting, are dropped; a running job gets a fresh deadline_seconds to
+    finish (for streams, between tokens). A stream stops at its next token
+    once abandoned, but a running batch cannot be interrupted: when it passes
+    its deadline only the waiter is released, and the job counts as timed_out
+    rather than completed.
+    """
+
+    def __init__(self, max_batch_size: int = 4, batch_wait_seconds: float = 0.01,
+                 deadline_seconds: float = 120.0):
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait_seconds = max(0.0, batch_wait_seconds)
+        self.deadline_seconds = deadline_seconds
+        self._pending: "OrderedDict[str, deque]" = OrderedDict()
+        self._pending_count = 0
+        self._cond = threading.Condition()
+        self._started_at = time.monotonic()
+        self._completed = 0
+        self._expired = 0
+        self._timed_out = 0
+        self._failed = 0
+        self._batches = 0
+        self._batched_jobs = 0
+        self._thread = threading.Thread(target=self._run, name="chat-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, prompt: str, client_key: Optional[str] = None, stream: bool = False,
+               deadline_seconds: Optional[float] = None,
+               options: Optional[Dict[str, Any]] = None) -> _ChatJob:
+        timeout = self.deadline_seconds if deadline_seconds is None else deadline_seconds
+        job = _ChatJob(prompt, client_key or "anonymous", time.monotonic() + timeout, stream, options)
+        with self._cond:
+            self._pending.setdefault(job.client_key, deque()).append(job)
+            self._pending_count += 1
+            self._cond.notify()
+        return job
+
+    def _pop_fair(self) -> Optional[_ChatJob]:
+        if not self._pending:
+            return None
+        client_key, jobs = next(iter(self._pending.items()))
+        job = jobs.popleft()
+        del self._pending[client_key]
+        if jobs:
+            # Move this client to the back of the rotation.
+            self._pending[client_key] = jobs
+        self._pending_count -= 1
+        return job
+
+    def _push_front(self, job: _ChatJob):
+        jobs = self._pending.get(job.client_key)
+        if jobs is None:
+            self._pending[job.client_key] = deque([job])
+            self._pending.move_to_end(job.client_key, last=False)
+        else:
+            jobs.appendleft(job)
+        self._pending_count += 1
+
+    def _next_batch(self) -> List[_ChatJob]:
+        with self._cond:
+            while self._pending_count == 0:
+                self._cond.wait()
+
+            first = self._pop_fair()
+            batch = [first]
+            if first.stream or self.max_batch_size == 1:
+                return batch
+
+            fill_deadline = time.monotonic() + self.batch_wait_seconds
+            while len(batch) < self.max_batch_size:
+                if self._pending_count == 0:
+                    remaining = fill_deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                    continue
+                job = self._pop_fair()
+                # A batch shares one generation config
+                if job.stream or _options_key(job.options) != _options_key(first.options):
+                    self._push_front(job)
+                    break
+                batch.append(job)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            now = time.monotonic()
+            live = []
+            for job in batch:
+                if job.deadline < now or job.stop_event.is_set():
+                    job.finish(error=DeadlineExceededError(
+                        "Chat request waited too long in the queue, please retry"
+                    ))
+                    with self._cond:
+                        self._expired += 1
+                else:
+                    job.timings["queue_wait_seconds"] = now - job.submitted_at
+                    job.deadline = now + self.deadline_seconds
+                    live.append(job)
+            if not live:
+                continue
+
+            try:
+                if live[0].stream:
+                    self._run_stream(live[0])
+                else:
+                    self._run_batch(live)
+                outcome = "_completed"
+            except BaseException as exc:
+                for job in live:
+                    if not job.done.is_set():
+                        job.finish(error=RuntimeError(f"Generation failed: {exc}"))
+                outcome = "_failed"
+
+            # Batch jobs whose waiter hit the deadline while they ran
+            timed_out = sum(1 for job in live if not job.stream and job.stop_event.is_set())
+            with self._cond:
+                setattr(self, outcome, getattr(self, outcome) + len(live) - timed_out)
+                self._timed_out += timed_out
+                self._batches += 1
+                self._batched_jobs += len(live)
+
+    def _run_batch(self, jobs: List[_ChatJob]):
+        pipeline = _get_pipeline()
+        config = _get_generation_config(pipeline, jobs[0].options)
+        started = time.perf_counter()
+        # Always pass a list: a single str prompt comes back as a plain str,
+        # without the perf metrics DecodingStats reads
+        result = pipeline.generate([job.prompt for job in jobs], config)
+        texts = _decoded_texts(result)
+        timings = _DECODING_STATS.record(result, texts, time.perf_counter() - started)
+        for job, text in zip(jobs, texts):
+            job.timings["decode_tokens_per_second"] = timings.get("decode_tokens_per_second")
+            if "ttft_seconds" in timings:
+                job.timings["ttft_seconds"] = job.timings["queue_wait_seconds"] + timings["ttft_seconds"]
+            job.finish(result=text)
+
+    def _run_stream(self, job: _ChatJob):
+        pipeline = _get_pipeline()
+        config = _get_generation_config(pipeline, job.options)
+        parts: List[str] = []
+        started = time.perf_counter()
+        first_token: List[float] = []
+
+        def streamer(token: str):
+            if not first_token:
+                first_token.append(time.perf_counter() - started)
+                job.timings["ttft_seconds"] = time.monotonic() - job.submitted_at
+            parts.append(token)
+            job.deadline = time.monotonic() + self.deadline_seconds
+            job.tokens.put(token)
+            if job.stop_event.is_set():
+                # The client went away; CANCEL also drops the partial reply
+                # from the pipeline's chat history (older releases take True).
+                return getattr(getattr(ov_genai, "StreamingStatus", None), "CANCEL", True)
+            return False
+
+        result = pipeline.generate([job.prompt], config, streamer=streamer)
+        text = "".join(parts)
+        timings = _DECODING_STATS.record(result, [text], time.perf_counter() - started,
+                                         first_token[0] if first_token else None)
+        job.timings["decode_tokens_per_second"] = timings.get("decode_tokens_per_second")
+        job.finish(result=text)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            uptime = max(time.monotonic() - self._started_at, 1e-9)
+            return {
+                "queue_depth": self._pending_count,
+                "queued_clients": len(self._pending),
+                "completed": self._completed,
+                "failed": self._failed,
+                "expired": self._expired,
+                "timed_out": self._timed_out,
+                "batches": self._batches,
+                "avg_batch_size": (self._batched_jobs / self._batches) if self._batches else 0.0,
+                "throughput_rps": self._completed / uptime,
+                "max_batch_size": self.max_batch_size,
+                "continuous_batching": CONTINUOUS_BATCHING,
+            }
+
+
+_SCHEDULER_LOCK = threading.Lock()
+_SCHEDULER: Optional[ChatScheduler] = None
+
+
+def get_scheduler() -> ChatScheduler:
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = ChatScheduler(
+                max_batch_size=BATCH_MAX_SIZE,
+                batch_wait_seconds=BATCH_WAIT_MS / 1000.0,
+                deadline_seconds=REQUEST_DEADLINE_SECONDS,
+            )
+        return _SCHEDULER
+
+
+def _generate_in_process(prompt: str, client_key: Optional[str] = None,
+                         options: Optional[Dict[str, Any]] = None,
+                         timings: Optional[Dict[str, float]] = None) -> str:
+    job = get_scheduler().submit(prompt, client_key, options=options)
+    try:
+        return job.wait()
+    finally:
+        if timings is not None:
+            timings.update(job.timings)
+
+
+def _generate_stream_in_process(prompt: str, client_key: Optional[str] = None,
+                                options: Optional[Dict[str, Any]] = None,
+                                timings: Optional[Dict[str, float]] = None) -> Iterable[str]:
+    # Submit now rather than on the first read, like the worker pool does
+    job = get_scheduler().submit(prompt, client_key, stream=True, options=options)
+    return _stream_job_tokens(job, timings)
+
+
+def _stream_job_tokens(job: _ChatJob, timings: Optional[Dict[str, float]]) -> Iterable[str]:
+    try:
+        while True:
+            try:
+                item = job.tokens.get(timeout=job.remaining())
+            except queue.Empty:
+                if job.remaining() > 0:
+                    continue
+                raise DeadlineExceededError("Chat generation stopped producing tokens, please retry")
+            if item is None:
+                break
+            yield item
+    finally:
+        job.stop_event.set()
+        if timings is not None:
+            timings.update(job.timings)
+
+    if job.error is not None:
+        raise job.error
+
+
+def _generate_text(prompt: str, client_key: Optional[str] = None,
+                   options: Optional[Dict[str, Any]] = None,
+                   timings: Optional[Dict[str, Any]] = None) -> str:
+    if inference_worker.worker_pool_enabled():
+        return inference_worker.get_worker_pool().generate(prompt, options, timings)
+    return _generate_in_process(prompt, client_key, options, timings)
+
+
+def _summarize(prompt: str) -> str:
+    options = {"max_new_tokens": HISTORY_SUMMARY_MAX_TOKENS, "temperature": 0.0}
+    return strip_thinking(_generate_text(prompt, "history-summary", options))
+
+
+def _summary_model_ready() -> bool:
+    return get_readiness()["state"] == "ready"
+
+
+_HISTORY_SUMMARIZER = HistorySummarizer(HISTORY_SUMMARY_CACHE_ENTRIES, _summarize, _summary_model_ready)
+
+
+def _prepare_prompt(messages: List[Dict[str, str]],
+                    context_docs: List[Dict[str, Any]]) -> Tuple[str, Dict[str, int]]:
+    summary, summarized_turns, messages = _HISTORY_SUMMARIZER.apply(messages)
+    prefix, suffix, usage = build_prompt_parts(
+        messages, context_docs, summary=summary, summarized_turns=summarized_turns
+    )
+    if PREFIX_CACHING:
+        _PREFIX_TRACKER.record(prefix)
+    return prefix + suffix, usage
+
+
+def _finish_timings(request_timings: Dict[str, Any], started: float,
+                    timings: Optional[Dict[str, Any]]):
+    request_timings["generation_seconds"] = time.perf_counter() - started
+    metrics.observe_timings(request_timings)
+    if timings is not None:
+        timings.update(request_timings)
+
+
+def generate_reply(
+    messages: List[Dict[str, str]],
+    context_docs: List[Dict[str, Any]],
+    client_key: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    timings: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Generate a reply. If timings is given it is filled with prompt_tokens,
+    queue_wait_seconds, ttft_seconds (when known), decode_tokens_per_second
+    and generation_seconds; these are also recorded in the metrics histograms.
+    """
+    prompt, usage = _prepare_prompt(messages, context_docs)
+    request_timings: Dict[str, Any] = {"prompt_tokens": usage["prompt_tokens"]}
+    started = time.perf_counter()
+    try:
+        reply = _generate_text(prompt, client_key, options, request_timings)
+    finally:
+        _finish_timings(request_timings, started, timings)
+    return strip_thinking(reply)
+
+
+def _timed_stream(tokens: Iterable[str], request_timings: Dict[str, Any], started: float,
+                  timings: Optional[Dict[str, Any]]) -> Iterable[str]:
+    try:
+        for token in tokens:
+            if "ttft_seconds" not in request_timings:
+                request_timings["ttft_seconds"] = time.perf_counter() - started
+            yield token
+    finally:
+        close = getattr(tokens, "close", None)
+        if close is not None:
+            close()
+        _finish_timings(request_timings, started, timings)
+
+
+def generate_reply_stream(
+    messages: List[Dict[str, str]],
+    context_docs: List[Dict[str, Any]],
+    client_key: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    timings: Optional[Dict[str, Any]] = None,
+) -> Iterable[str]:
+    """Streaming variant of generate_reply; timings are filled once the stream ends."""
+    prompt, usage = _prepare_prompt(messages, context_docs)
+    request_timings: Dict[str, Any] = {"prompt_tokens": usage["prompt_tokens"]}
+    started = time.perf_counter()
+    if inference_worker.worker_pool_enabled():
+        tokens = inference_worker.get_worker_pool().generate_stream(prompt, options, request_timings)
+    else:
+        tokens = _generate_stream_in_process(prompt, client_key, options, request_timings)
+    return _filter_thinking_stream(_timed_stream(tokens, request_timings, started, timings))
+
+
+def get_inference_stats() -> Dict[str, Any]:
+    if inference_worker.worker_pool_enabled():
+        stats = inference_worker.get_worker_pool().stats()
+    else:
+        stats = {
+            "mode": "in_process",
+            "pipeline_loaded": _PIPELINE is not None,
+            "scheduler": get_scheduler().stats(),
+        }
+    stats["prefix_cache"] = _PREFIX_TRACKER.stats()
+    stats["prompt"] = _PROMPT_STATS.stats()
+    stats["history_summary"] = _HISTORY_SUMMARIZER.stats()
+    with _THINKING_LOCK:
+        stats["thinking"] = dict(_THINKING_STATS, enabled=THINKING_ENABLED)
+    if not inference_worker.worker_pool_enabled():
+        # Workers decode in their own processes, so these counters only
+        # cover in-process generation.
+        stats["decoding"] = _DECODING_STATS.stats()
+    return stats
@@ -0,0 +1,170 @@
+"""
+Rebuild or repair the ChromaDB collections from the SQL database.
+
+Streams Posts, public Meetings and classroom Profiles out of the database in
+primary-key order, one chunk at a time, and writes them with batched
+hash-aware upserts: documents that are missing or whose text changed are
+embedded, everything else is left alone (or gets a metadata-only update).
+IDs in the collection that no longer match a database row are removed.
+Only IDs this backend manages (post-*, meeting-*, classroom_*) are ever
+pruned, so documents added through /api/documents are kept.
+
+Stop the backend first; ChromaDB's persistent client is not safe to share
+between processes. A relative CHROMA_PERSIST_DIRECTORY is resolved against
+penpals-backend/, where the server runs from, whatever the working directory.
+The write-behind queue is not started: its journal holds changes already in
+the database, which this rebuild covers, and the server replays it as usual.
+
+    python src/reindex_chroma.py                  repair both collections
+    python src/reindex_chroma.py --dry-run        only report missing / orphaned IDs
+    python src/reindex_chroma.py --force          re-embed every document
+    python src/reindex_chroma.py --collection classroom_interests --batch-size 128
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = Path(__file__).resolve().parent
+load_dotenv(dotenv_path=BACKEND_ROOT / '.env')
+load_dotenv(dotenv_path=SRC_ROOT / '.env')
+sys.path.insert(0, str(SRC_ROOT))
+
+# Same store the server uses when started as `python src/app.py` from penpals-backend/
+os.environ['CHROMA_PERSIST_DIRECTORY'] = str(BACKEND_ROOT / os.getenv('CHROMA_PERSIST_DIRECTORY', './chroma_db'))
+# Index synchronously: importing main must not start the queue or replay its journal
+os.environ['CHROMA_INDEX_ASYNC'] = 'false'
+
+from main import application, build_meeting_index_entry, build_post_index_entry, chroma_service
+from classroom import build_classroom_index_entry, chroma_service as classroom_chroma_service
+from models import db, Meeting, Post, Profile
+
+ID_PAGE_SIZE = 1000
+
+
+def iter_rows(model, chunk_size, *filters):
+    """Keyset-paginate a table by primary key so it never loads in one go."""
+    last_id = 0
+    while True:
+        rows = model.query.filter(model.id > last_id, *filters).order_by(model.id).limit(chunk_size).all()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1].id
+        # Drop the processed chunk from the session's identity map
+        db.session.expunge_all()
+
+
+def document_entries(chunk_size):
+    for post in iter_rows(Post, chunk_size):
+        yield build_post_index_entry(post)
+    for meeting in iter_rows(Meeting, chunk_size, Meeting.visibility == 'public', Meeting.status != 'cancelled'):
+        entry = build_meeting_index_entry(meeting)
+        if entry is not None:
+            yield entry
+
+
+def classroom_entries(chunk_size):
+    for classroom in iter_rows(Profile, chunk_size):
+        entry = build_classroom_index_entry(classroom)
+        if entry is not None:
+            yield entry
+
+
+# collection -> (service, entry source, ID prefixes this backend owns)
+COLLECTIONS = {
+    "penpals_documents": (chroma_service, document_entries, ("post-", "meeting-")),
+    "classroom_interests": (classroom_chroma_service, classroom_entries, ("classroom_",)),
+}
+
+
+def existing_ids(service):
+    ids, offset = set(), 0
+    while True:
+        page = service.collection.get(include=[], limit=ID_PAGE_SIZE, offset=offset)
+        ids.update(page["ids"])
+        if len(page["ids"]) < ID_PAGE_SIZE:
+            return ids
+        offset += ID_PAGE_SIZE
+
+
+def reindex_collection(name, batch_size, force=False, dry_run=False):
+    service, entries, managed_prefixes = COLLECTIONS[name]
+    started = time.perf_counter()
+    indexed = existing_ids(service)
+    seen = set()
+    counts = {"scanned": 0, "missing": 0, "embedded": 0, "metadata_only": 0, "unchanged": 0,
+              "orphaned": 0, "errors": 0}
+    batch = []
+
+    def write(batch):
+        counts["missing"] += sum(1 for doc_id, _, _ in batch if doc_id not in indexed)
+        if dry_run:
+            return
+        result = service.upsert_documents(
+            [document for _, document, _ in batch],
+            ids=[doc_id for doc_id, _, _ in batch],
+            metadatas=[metadata for _, _, metadata in batch],
+            force=force,
+        )
+        if result.get("status") != "success":
+            counts["errors"] += len(batch)
+            print(f"  upsert failed for {len(batch)} documents: {result.get('message')}")
+            return
+        for key in ("embedded", "metadata_only", "unchanged"):
+            counts[key] += result[key]
+
+    for doc_id, document, metadata in entries(batch_size):
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        batch.append((doc_id, document, metadata))
+        counts["scanned"] += 1
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+
+    orphans = sorted(doc_id for doc_id in indexed - seen if doc_id.startswith(managed_prefixes))
+    counts["orphaned"] = len(orphans)
+    if not dry_run:
+        for i in range(0, len(orphans), batch_size):
+            result = service.delete_documents(orphans[i:i + batch_size])
+            if result.get("status") != "success":
+                counts["errors"] += len(orphans[i:i + batch_size])
+                print(f"  delete failed: {result.get('message')}")
+
+    elapsed = time.perf_counter() - started
+    rate = counts["scanned"] / elapsed if elapsed > 0 else 0.0
+    print(f"{name}: {counts['scanned']} docs in {elapsed:.2f}s ({rate:.1f} docs/sec)"
+          f"{' [dry run]' if dry_run else ''}")
+    print(f"  missing {counts['missing']} | orphaned {counts['orphaned']} | "
+          f"embedded {counts['embedded']} | metadata-only {counts['metadata_only']} | "
+          f"unchanged {counts['unchanged']} | errors {counts['errors']}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--collection', choices=[*COLLECTIONS, 'all'], default='all')
+    parser.add_argument('--batch-size', type=int, default=256, help='rows read and documents upserted per batch')
+    parser.add_argument('--force', action='store_true', help='re-embed documents even if their text is unchanged')
+    parser.add_argument('--dry-run', action='store_true', help='report missing and orphaned IDs without writing')
+    args = parser.parse_args()
+
+    names = list(COLLECTIONS) if args.collection == 'all' else [args.collection]
+    errors = 0
+    with application.app_context():
+        for name in names:
+            errors += reindex_collection(name, max(1, args.batch_size), args.force, args.dry_run)["errors"]
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""
+Response cache for the RAG chat endpoint.
+
+Replies are keyed on the normalized user message, the conversation history
+and the IDs of the retrieved context documents. Lookups happen after
+retrieval, so a newly indexed document that changes the retrieved set is a
+natural miss, while edits to a cited document invalidate the entries that
+cited it. Near-duplicate questions can optionally match by embedding
+similarity when the retrieved documents are the same.
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+
+def normalize_message(message: str) -> str:
+    lowered = (message or "").lower()
+    lowered = re.sub(r"\s+", " ", lowered).strip()
+    return lowered.strip(" .,!?;:")
+
+
+def _hash_json(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = math.sqrt(sum(x * x for x in a))
+    norm_b = math.sqrt(sum(y * y for y in b))
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / (norm_a * norm_b)
+
+
+class _CacheEntry:
+    def __init__(self, reply: str, doc_ids: List[str], scope_key: str,
+                 embedding: Optional[List[float]], generation_seconds: float):
+        self.reply = reply
+        self.doc_ids = doc_ids
+        self.scope_key = scope_key
+        self.embedding = embedding
+        self.generation_seconds = generation_seconds
+        self.created_at = time.monotonic()
+
+
+class ChatResponseCache:
+    """TTL + LRU bounded cache of chat replies with doc-based invalidation."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 600.0,
+                 similarity_threshold: float = 0.0,
+                 embed_fn: Optional[Callable[[str], Optional[List[float]]]] = None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._keys_by_doc: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def _scope_key(history: List[Dict[str, Any]], doc_ids: List[str], variant: Any = None) -> str:
+        return _hash_json({"history": history, "doc_ids": sorted(doc_ids), "variant": variant})
+
+    @staticmethod
+    def _exact_key(normalized: str, scope_key: str) -> str:
+        return _hash_json({"message": normalized, "scope": scope_key})
+
+    def _similarity_enabled(self) -> bool:
+        return self.embed_fn is not None and self.similarity_threshold > 0
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            embedding = self.embed_fn(text)
+        except Exception:
+            return None
+        return list(embedding) if embedding is not None else None
+
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for doc_id in entry.doc_ids:
+            keys = self._keys_by_doc.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_doc[doc_id]
+
+    def _hit(self, key: str, entry: _CacheEntry, similar: bool) -> str:
+        self._entries.move_to_end(key)
+        if similar:
+            self.similar_hits += 1
+        else:
+            self.hits += 1
+        self.seconds_saved += entry.generation_seconds
+        return entry.reply
+
+    def get(self, message: str, history: List[Dict[str, Any]], doc_ids: List[str],
+            variant: Any = None) -> Optional[str]:
+        """variant holds anything else the reply depends on, e.g. generation options."""
+        normalized = normalize_message(message)
+        scope_key = self._scope_key(history, doc_ids, variant)
+        key = self._exact_key(normalized, scope_key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._is_expired(entry, now):
+                    return self._hit(key, entry, similar=False)
+                self._remove(key)
+            if not self._similarity_enabled():
+                self.misses += 1
+                return None
+            candidates = [
+                (candidate_key, candidate)
+                for candidate_key, candidate in self._entries.items()
+                if candidate.scope_key == scope_key and candidate.embedding is not None
+            ]
+
+        if not candidates:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Embed outside the lock; the embedding model is the slow part.
+        query_embedding = self._embed(normalized)
+        with self._lock:
+            if query_embedding is not None:
+                best_key, best_score = None, self.similarity_threshold
+                for candidate_key, candidate in candidates:
+                    if candidate_key not in self._entries or self._is_expired(candidate, now):
+                        continue
+                    score = _cosine_similarity(query_embedding, candidate.embedding)
+                    if score >= best_score:
+                        best_key, best_score = candidate_key, score
+                if best_key is not None:
+                    return self._hit(best_key, self._entries[best_key], similar=True)
+            self.misses += 1
+            return None
+
+    def put(self, message: str, history: List[Dict[str, Any]], doc_ids: List[str],
+            reply: str, generation_seconds: float = 0.0, variant: Any = None):
+        if not isinstance(reply, str) or not reply:
+            return
+        normalized = normalize_message(message)
+        scope_key = self._scope_key(history, doc_ids, variant)
+        key = self._exact_key(normalized, scope_key)
+        embedding = self._embed(normalized) if self._similarity_enabled() else None
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _CacheEntry(reply, list(doc_ids), scope_key, embedding, generation_seconds)
+            for doc_id in doc_ids:
+                self._keys_by_doc.setdefault(doc_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for doc_id in doc_ids:
+                for key in list(self._keys_by_doc.get(str(doc_id), ())):
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_doc.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold if self._similarity_enabled() else None,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.similar_hits) / lookups) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "seconds_saved": round(self.seconds_saved, 3),
+            }
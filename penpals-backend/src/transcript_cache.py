@@ -0,0 +1,123 @@
+"""
+On-disk transcript cache for /api/chat/transcribe.
+
+Entries are content-addressed: the key is a hash of the audio bytes plus
+everything else that changes the transcript (model size, beam size,
+hotwords). Each entry is one small JSON file; when the directory grows past
+max_bytes the least recently used files are removed. Re-submitting the same
+recording after a failed chat call then skips the Whisper decode entirely.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class TranscriptCache:
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(audio_bytes: bytes, **params: Any) -> str:
+        digest = hashlib.sha256(audio_bytes)
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached segments for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                segments = json.load(cache_file)["segments"]
+            # mtime doubles as the LRU timestamp for eviction
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return segments
+
+    def put(self, key: str, segments: List[Dict[str, Any]]):
+        if self.max_bytes <= 0 or not segments:
+            return
+        payload = json.dumps({"segments": segments}).encode("utf-8")
+        if len(payload) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(temp_path, "wb") as cache_file:
+                cache_file.write(payload)
+            # Atomic rename so concurrent readers never see a partial file
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Transcript cache write failed: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self.writes += 1
+            if self._total_bytes is not None:
+                self._total_bytes += len(payload) - previous_size
+            self._evict_locked()
+
+    def _scan_locked(self) -> List[os.DirEntry]:
+        try:
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_file() and entry.name.endswith(".json")]
+        except OSError:
+            entries = []
+        self._total_bytes = sum(entry.stat().st_size for entry in entries)
+        return entries
+
+    def _evict_locked(self):
+        if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+            return
+        entries = self._scan_locked()
+        if self._total_bytes <= self.max_bytes:
+            return
+        for entry in sorted(entries, key=lambda item: item.stat().st_mtime):
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self.evictions += 1
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._total_bytes is None:
+                self._scan_locked()
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+            }
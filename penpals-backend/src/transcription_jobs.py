@@ -0,0 +1,229 @@
+"""
+Background transcription jobs for /api/chat/transcribe.
+
+Uploads submitted in job mode return a job ID immediately; a bounded pool of
+worker threads runs faster-whisper over the queue. Clients poll the job for
+its state and the segments decoded so far. The queue length is capped and
+each job has a wall-clock timeout, so long recordings cannot tie up request
+threads or starve the rest of the API.
+"""
+
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+TRANSCRIBE_JOB_WORKERS = int(os.getenv("TRANSCRIBE_JOB_WORKERS", "1"))
+TRANSCRIBE_JOB_MAX_QUEUE = int(os.getenv("TRANSCRIBE_JOB_MAX_QUEUE", "16"))
+TRANSCRIBE_JOB_TIMEOUT_SECONDS = float(os.getenv("TRANSCRIBE_JOB_TIMEOUT_SECONDS", "300"))
+TRANSCRIBE_JOB_RESULT_TTL_SECONDS = float(os.getenv("TRANSCRIBE_JOB_RESULT_TTL_SECONDS", "600"))
+
+# transcribe_fn(audio_bytes, hotwords, deadline) yields segment dicts:
+# {"start", "end", "text"}. deadline is a time.monotonic() value the source
+# should not start (or wait for) work past.
+SegmentSource = Callable[[bytes, str, float], Iterable[Dict[str, Any]]]
+
+
+class TranscriptionQueueFullError(RuntimeError):
+    """Raised when the job queue is at TRANSCRIBE_JOB_MAX_QUEUE."""
+
+
+class TranscriptionJob:
+    def __init__(self, audio_bytes: bytes, hotwords: str, sequence: int):
+        self.id = uuid.uuid4().hex
+        self.sequence = sequence
+        self.audio_bytes: Optional[bytes] = audio_bytes
+        self.hotwords = hotwords
+        self.state = "queued"
+        self.segments: List[Dict[str, Any]] = []
+        self.transcript: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.updated = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "error", "timeout")
+
+    def wait_for_update(self, seen_segments: int, seen_state: Optional[str], timeout: float) -> bool:
+        """Block until a new segment arrives or the state moves on from seen_state."""
+        with self.updated:
+            return self.updated.wait_for(
+                lambda: len(self.segments) > seen_segments or self.state != seen_state, timeout
+            )
+
+    def to_dict(self, since: int = 0) -> Dict[str, Any]:
+        with self.updated:
+            return {
+                "job_id": self.id,
+                "state": self.state,
+                "segments": self.segments[since:],
+                "segment_count": len(self.segments),
+                "transcript": self.transcript,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class TranscriptionJobQueue:
+    """Bounded FIFO of transcription jobs drained by a fixed number of worker threads."""
+
+    def __init__(self, transcribe_fn: SegmentSource, workers: int = 1, max_queue: int = 16,
+                 timeout_seconds: float = 300.0, result_ttl_seconds: float = 600.0):
+        self.transcribe_fn = transcribe_fn
+        self.timeout_seconds = timeout_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self._queue: "queue.Queue[TranscriptionJob]" = queue.Queue(maxsize=max(1, max_queue))
+        self._jobs: "OrderedDict[str, TranscriptionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sequence = 0
+        self._next_started = 1
+        self._busy = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._rejected = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"transcription-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, audio_bytes: bytes, hotwords: str = "") -> TranscriptionJob:
+        self._expire_finished()
+        with self._lock:
+            job = TranscriptionJob(audio_bytes, hotwords, self._last_sequence + 1)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._rejected += 1
+                raise TranscriptionQueueFullError("Transcription queue is full, please retry shortly")
+            self._last_sequence = job.sequence
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[TranscriptionJob]:
+        self._expire_finished()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job: TranscriptionJob) -> int:
+        """Jobs ahead of this one that have not started yet (0 once it is running)."""
+        if job.state != "queued":
+            return 0
+        with self._lock:
+            return max(0, job.sequence - self._next_started)
+
+    def _expire_finished(self):
+        cutoff = time.time() - self.result_ttl_seconds
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.finished and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._busy += 1
+                self._next_started = max(self._next_started, job.sequence + 1)
+            try:
+                self._process(job)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+    def _process(self, job: TranscriptionJob):
+        with job.updated:
+            job.state = "running"
+            job.started_at = time.time()
+            job.updated.notify_all()
+
+        deadline = time.monotonic() + self.timeout_seconds
+        outcome, error = "done", None
+        segments = None
+        try:
+            segments = iter(self.transcribe_fn(job.audio_bytes, job.hotwords, deadline))
+            for segment in segments:
+                with job.updated:
+                    job.segments.append(segment)
+                    job.updated.notify_all()
+                # faster-whisper decodes lazily, so stopping here stops the work
+                if time.monotonic() > deadline:
+                    outcome, error = "timeout", f"Transcription exceeded {self.timeout_seconds:g}s"
+                    break
+        except Exception as e:
+            if time.monotonic() > deadline:
+                # e.g. the wait for a model was cut short by the deadline
+                outcome, error = "timeout", f"Transcription exceeded {self.timeout_seconds:g}s"
+            else:
+                outcome, error = "error", str(e)
+        finally:
+            close = getattr(segments, "close", None)
+            if close is not None:
+                close()
+
+        with job.updated:
+            job.audio_bytes = None
+            job.transcript = " ".join(
+                segment["text"] for segment in job.segments if segment.get("text")
+            ).strip()
+            if outcome == "done" and not job.transcript:
+                outcome, error = "error", "faster-whisper returned an empty transcript"
+            job.state = outcome
+            job.error = error
+            job.finished_at = time.time()
+            job.updated.notify_all()
+
+        with self._lock:
+            if outcome == "done":
+                self._completed += 1
+            elif outcome == "timeout":
+                self._timed_out += 1
+            else:
+                self._failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": len(self._threads),
+                "busy_workers": self._busy,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "timeout_seconds": self.timeout_seconds,
+                "tracked_jobs": len(self._jobs),
+                "completed": self._completed,
+                "failed": self._failed,
+                "timed_out": self._timed_out,
+                "rejected": self._rejected,
+            }
+
+
+_QUEUE_LOCK = threading.Lock()
+_QUEUE: Optional[TranscriptionJobQueue] = None
+
+
+def get_transcription_queue(transcribe_fn: SegmentSource) -> TranscriptionJobQueue:
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = TranscriptionJobQueue(
+                transcribe_fn,
+                workers=TRANSCRIBE_JOB_WORKERS,
+                max_queue=TRANSCRIBE_JOB_MAX_QUEUE,
+                timeout_seconds=TRANSCRIBE_JOB_TIMEOUT_SECONDS,
+                result_ttl_seconds=TRANSCRIBE_JOB_RESULT_TTL_SECONDS,
+            )
+        return _QUEUE
+
+
+def queue_started() -> bool:
+    return _QUEUE is not None
@@ -0,0 +1,144 @@
+"""
+Pool of faster-whisper models for concurrent transcription.
+
+Each WhisperModel gets an equal share of the CPU threads, and a semaphore
+admits at most one transcription per model; further requests wait in a
+bounded admission queue. Throughput then scales with cores instead of every
+request sharing one model and oversubscribing the CPU.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+FASTER_WHISPER_POOL_SIZE = int(os.getenv("FASTER_WHISPER_POOL_SIZE", "1"))
+FASTER_WHISPER_CPU_THREADS = int(os.getenv("FASTER_WHISPER_CPU_THREADS", str(os.cpu_count() or 4)))
+FASTER_WHISPER_MAX_WAITING = int(os.getenv("FASTER_WHISPER_MAX_WAITING", "8"))
+FASTER_WHISPER_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("FASTER_WHISPER_ACQUIRE_TIMEOUT_SECONDS", "120"))
+
+
+class WhisperPoolBusyError(RuntimeError):
+    """Raised when too many transcriptions are already waiting for a model."""
+
+
+class WhisperModelPool:
+    def __init__(self, factory: Callable[[int], Any], size: int = 1, total_cpu_threads: int = 4,
+                 max_waiting: int = 8, acquire_timeout_seconds: float = 120.0):
+        """
+        Args:
+            factory: builds one model given its cpu_threads
+            size: number of models (and concurrent transcriptions)
+            total_cpu_threads: CPU threads split evenly across the models
+            max_waiting: requests allowed to queue for a model before rejecting
+            acquire_timeout_seconds: how long a queued request waits for a model
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.cpu_threads_per_model = max(1, total_cpu_threads // self.size)
+        self.max_waiting = max(0, max_waiting)
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._idle: List[Any] = []
+        self._loaded = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._acquired = 0
+        self._rejected = 0
+        self._timeouts = 0
+
+    def _checkout_model(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        # Load outside the lock; the semaphore already guarantees we never
+        # hold more than size models.
+        model = self.factory(self.cpu_threads_per_model)
+        with self._lock:
+            self._loaded += 1
+        return model
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Hold one model for the duration of the with block.
+
+        Args:
+            timeout: max seconds to wait for a model, capped at acquire_timeout_seconds
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout_seconds
+        else:
+            timeout = max(0.0, min(timeout, self.acquire_timeout_seconds))
+        with self._lock:
+            if self._waiting >= self.max_waiting and self._in_use >= self.size:
+                self._rejected += 1
+                raise WhisperPoolBusyError("Transcription is busy, please retry shortly")
+            self._waiting += 1
+
+        started = time.perf_counter()
+        admitted = self._slots.acquire(timeout=timeout)
+        with self._lock:
+            self._waiting -= 1
+            if not admitted:
+                self._timeouts += 1
+        if not admitted:
+            raise WhisperPoolBusyError("Timed out waiting for a transcription model")
+        metrics.observe("transcribe_queue_wait_seconds", time.perf_counter() - started)
+
+        try:
+            model = self._checkout_model()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        held_since = time.perf_counter()
+        try:
+            yield model
+        finally:
+            metrics.observe("transcribe_seconds", time.perf_counter() - held_since)
+            with self._lock:
+                self._in_use -= 1
+                self._idle.append(model)
+            self._slots.release()
+
+    def warm_up(self, warm_fn: Optional[Callable[[Any], None]] = None):
+        """Load every model up front (and optionally run warm_fn on each)."""
+        held = []
+        try:
+            for _ in range(self.size):
+                self._slots.acquire()
+                try:
+                    held.append(self._checkout_model())
+                except Exception:
+                    self._slots.release()
+                    raise
+            if warm_fn is not None:
+                for model in held:
+                    warm_fn(model)
+        finally:
+            with self._lock:
+                self._idle.extend(held)
+            for _ in held:
+                self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "cpu_threads_per_model": self.cpu_threads_per_model,
+                "loaded": self._loaded,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "max_waiting": self.max_waiting,
+                "acquired": self._acquired,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+            }
@@ -0,0 +1,85 @@
+import json
+import threading
+
+import index_queue
+from index_queue import IndexingQueue
+
+
+class FakeService:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.upserts = []
+        self.deletes = []
+        self.lock = threading.Lock()
+
+    def upsert_documents(self, documents, ids=None, metadatas=None):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                return {"status": "error", "message": "chroma unavailable"}
+            self.upserts.extend(zip(ids, documents, metadatas))
+            return {"status": "success"}
+
+    def delete_documents(self, ids):
+        with self.lock:
+            self.deletes.extend(ids)
+            return {"status": "success"}
+
+
+def make_queue(service, **kwargs):
+    kwargs.setdefault("flush_seconds", 0.2)
+    return IndexingQueue(lambda collection: service, **kwargs)
+
+
+def test_newest_change_for_a_document_wins():
+    service = FakeService()
+    queue = make_queue(service)
+    queue.upsert("posts", "1", "first", {"v": 1})
+    queue.upsert("posts", "1", "second", {"v": 2})
+    queue.upsert("posts", "2", "other", {"v": 1})
+    queue.delete("posts", "2")
+    assert queue.flush(timeout=5)
+    assert service.upserts == [("1", "second", {"v": 2})]
+    assert service.deletes == ["2"]
+    assert queue.stats()["batches"] == 1
+
+
+def test_journal_is_replayed_on_start_and_removed_after_write(tmp_path):
+    journal = tmp_path / "pending.jsonl"
+    ops = [
+        {"op": "upsert", "collection": "posts", "id": "1", "document": "old", "metadata": {}},
+        {"op": "upsert", "collection": "posts", "id": "1", "document": "new", "metadata": {}},
+        {"op": "delete", "collection": "meetings", "id": "7"},
+    ]
+    # The last line was torn by a crash mid-append
+    journal.write_text("".join(json.dumps(op) + "\n" for op in ops) + '{"op": "ups')
+
+    service = FakeService()
+    queue = make_queue(service, journal_path=str(journal))
+    assert queue.stats()["recovered"] == 2
+    assert queue.flush(timeout=5)
+    assert service.upserts == [("1", "new", {})]
+    assert service.deletes == ["7"]
+    assert not journal.exists()
+
+
+def test_pending_changes_are_journaled_before_write(tmp_path):
+    journal = tmp_path / "pending.jsonl"
+    queue = make_queue(FakeService(failures=1000), journal_path=str(journal))
+    queue.upsert("posts", "1", "body", {"author": "a"})
+    lines = [json.loads(line) for line in journal.read_text().splitlines()]
+    assert lines == [{"op": "upsert", "collection": "posts", "id": "1",
+                      "document": "body", "metadata": {"author": "a"}}]
+
+
+def test_failed_batch_is_retried(monkeypatch):
+    monkeypatch.setattr(index_queue, "MAX_RETRY_DELAY_SECONDS", 0.05)
+    service = FakeService(failures=2)
+    queue = make_queue(service, flush_seconds=0)
+    queue.upsert("posts", "1", "body", {})
+    assert queue.flush(timeout=5)
+    stats = queue.stats()
+    assert service.upserts == [("1", "body", {})]
+    assert stats["consecutive_failures"] == 0
+    assert stats["last_error"] == "chroma unavailable"
+    assert stats["written"] == 1
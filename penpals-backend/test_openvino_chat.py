@@ -0,0 +1,115 @@
+import pytest
+
+import openvino_chat
+from openvino_chat import ThinkingFilter, build_prompt_parts, normalize_generation_options
+
+
+@pytest.fixture(autouse=True)
+def estimated_token_counts(monkeypatch):
+    # Count tokens as chars / 4 instead of loading the model's tokenizer
+    monkeypatch.setattr(openvino_chat, "_get_tokenizer", lambda: None)
+
+
+def feed_all(tokens):
+    thinking_filter = ThinkingFilter()
+    visible = "".join(thinking_filter.feed(token) for token in tokens) + thinking_filter.flush()
+    return visible, thinking_filter
+
+
+def test_thinking_filter_drops_a_block_split_across_tokens():
+    visible, thinking_filter = feed_all(["<th", "ink>plan", "ning</t", "hink>", "  Hello", " there"])
+    assert visible == "Hello there"
+    assert thinking_filter.dropped_chars == len("<think>planning</think>")
+
+
+def test_thinking_filter_keeps_text_that_only_looks_like_a_tag():
+    visible, _ = feed_all(["a <", "b> and <thi", "s"])
+    assert visible == "a <b> and <this"
+
+
+def test_thinking_filter_drops_an_unclosed_block():
+    visible, _ = feed_all(["Answer. ", "<thinking>never", " closed"])
+    assert visible == "Answer. "
+
+
+def test_thinking_filter_is_case_insensitive():
+    visible, _ = feed_all(["<THINK>x</Think>Hi"])
+    assert visible == "Hi"
+
+
+def test_normalize_generation_options_clamps_to_caps():
+    options, error = normalize_generation_options({
+        "max_new_tokens": 10 ** 6,
+        "temperature": 99,
+        "stop": "\n\n",
+    })
+    assert error is None
+    assert options["max_new_tokens"] == openvino_chat.MAX_NEW_TOKENS_CAP
+    assert options["temperature"] == openvino_chat.MAX_TEMPERATURE
+    assert options["stop"] == ["\n\n"]
+
+
+@pytest.mark.parametrize("raw", [
+    {"max_new_tokens": 0},
+    {"max_new_tokens": True},
+    {"temperature": -1},
+    {"stop": [""]},
+    {"stop": ["x"] * (openvino_chat.MAX_STOP_SEQUENCES + 1)},
+])
+def test_normalize_generation_options_rejects_bad_values(raw):
+    options, error = normalize_generation_options(raw)
+    assert options is None
+    assert error
+
+
+def test_normalize_generation_options_only_keeps_keys_that_were_set():
+    assert normalize_generation_options({}) == ({}, None)
+    assert normalize_generation_options(None) == ({}, None)
+
+
+def turns(count, words=20):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * words}
+        for i in range(count)
+    ]
+
+
+def doc(doc_id, similarity, words=40):
+    return {"id": doc_id, "document": f"{doc_id} " + "text " * words, "similarity": similarity}
+
+
+def test_build_prompt_parts_fits_everything_under_a_large_budget():
+    messages = turns(4) + [{"role": "user", "content": "latest question"}]
+    prefix, suffix, usage = build_prompt_parts(messages, [doc("a", 0.9)], token_budget=10_000)
+    assert usage["dropped_turns"] == 0
+    assert usage["dropped_docs"] == 0
+    assert "turn 0" in prefix
+    assert suffix.endswith("User: latest question\nAssistant:")
+    assert "[1]" in suffix
+
+
+def test_build_prompt_parts_drops_oldest_turns_first():
+    messages = turns(20) + [{"role": "user", "content": "latest question"}]
+    prefix, _, usage = build_prompt_parts(messages, [], token_budget=400)
+    assert usage["dropped_turns"] > 0
+    assert usage["prompt_tokens"] <= 400
+    assert "turn 19" in prefix
+    assert "turn 0 " not in prefix
+
+
+def test_build_prompt_parts_trims_lowest_similarity_docs_and_keeps_retrieval_order():
+    docs = [doc("low", 0.1), doc("high", 0.9), doc("mid", 0.5)]
+    messages = [{"role": "user", "content": "q"}]
+    _, suffix, usage = build_prompt_parts(messages, docs, token_budget=230)
+    assert usage["dropped_docs"] == 1
+    assert "low " not in suffix
+    assert suffix.index("high ") < suffix.index("mid ")
+
+
+def test_build_prompt_parts_prefix_is_stable_across_new_messages():
+    history = turns(4)
+    first, _, _ = build_prompt_parts(history + [{"role": "user", "content": "one"}], [doc("a", 0.9)],
+                                     token_budget=10_000)
+    second, _, _ = build_prompt_parts(history + [{"role": "user", "content": "two"}], [doc("b", 0.8)],
+                                      token_budget=10_000)
+    assert first == second
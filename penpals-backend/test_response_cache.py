@@ -0,0 +1,68 @@
+import response_cache
+from response_cache import ChatResponseCache
+
+
+def test_hit_ignores_case_whitespace_and_trailing_punctuation():
+    cache = ChatResponseCache()
+    cache.put("What classes are there?", [], ["doc-1"], "reply")
+    assert cache.get("  what CLASSES are there ", [], ["doc-1"]) == "reply"
+    assert cache.stats()["hits"] == 1
+
+
+def test_miss_when_history_docs_or_variant_differ():
+    cache = ChatResponseCache()
+    cache.put("hi", [], ["doc-1"], "reply", variant={"temperature": 0.2})
+    assert cache.get("hi", [{"role": "user", "content": "earlier"}], ["doc-1"], {"temperature": 0.2}) is None
+    assert cache.get("hi", [], ["doc-2"], {"temperature": 0.2}) is None
+    assert cache.get("hi", [], ["doc-1"], {"temperature": 0.9}) is None
+    assert cache.get("hi", [], ["doc-1"], {"temperature": 0.2}) == "reply"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = ChatResponseCache(ttl_seconds=10)
+    cache.put("hi", [], [], "reply")
+    now[0] += 5
+    assert cache.get("hi", [], []) == "reply"
+    now[0] += 10
+    assert cache.get("hi", [], []) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ChatResponseCache(max_entries=2)
+    cache.put("a", [], [], "A")
+    cache.put("b", [], [], "B")
+    assert cache.get("a", [], []) == "A"
+    cache.put("c", [], [], "C")
+    assert cache.get("b", [], []) is None
+    assert cache.get("a", [], []) == "A"
+    assert cache.get("c", [], []) == "C"
+
+
+def test_invalidate_documents_removes_only_entries_citing_them():
+    cache = ChatResponseCache()
+    cache.put("a", [], ["doc-1", "doc-2"], "A")
+    cache.put("b", [], ["doc-3"], "B")
+    assert cache.invalidate_documents(["doc-2"]) == 1
+    assert cache.get("a", [], ["doc-1", "doc-2"]) is None
+    assert cache.get("b", [], ["doc-3"]) == "B"
+    assert cache.invalidate_documents(["doc-2"]) == 0
+
+
+def test_similar_question_hits_when_docs_match():
+    vectors = {"how do i join a class": [1.0, 0.0], "how can i join a class": [0.99, 0.1],
+               "what is the weather": [0.0, 1.0]}
+    cache = ChatResponseCache(similarity_threshold=0.9, embed_fn=vectors.get)
+    cache.put("How do I join a class?", [], ["doc-1"], "reply")
+    assert cache.get("How can I join a class?", [], ["doc-1"]) == "reply"
+    assert cache.get("What is the weather?", [], ["doc-1"]) is None
+    assert cache.get("How can I join a class?", [], ["doc-9"]) is None
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_empty_replies_are_not_cached():
+    cache = ChatResponseCache()
+    cache.put("hi", [], [], "")
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,57 @@
+import os
+
+from transcript_cache import TranscriptCache
+
+SEGMENTS = [{"start": 0.0, "end": 1.5, "text": "hello"}]
+
+
+def test_round_trip(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    key = TranscriptCache.make_key(b"audio", model_size="small", beam_size=1)
+    assert cache.get(key) is None
+    cache.put(key, SEGMENTS)
+    assert cache.get(key) == SEGMENTS
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_key_depends_on_audio_and_params():
+    base = TranscriptCache.make_key(b"audio", model_size="small", hotwords="")
+    assert base == TranscriptCache.make_key(b"audio", hotwords="", model_size="small")
+    assert base != TranscriptCache.make_key(b"other", model_size="small", hotwords="")
+    assert base != TranscriptCache.make_key(b"audio", model_size="small", hotwords="PenPals")
+
+
+def test_write_leaves_no_temp_files(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    cache.put("k", SEGMENTS)
+    cache.put("k", SEGMENTS + SEGMENTS)
+    assert os.listdir(tmp_path) == ["k.json"]
+    assert cache.get("k") == SEGMENTS + SEGMENTS
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    (tmp_path / "bad.json").write_text("{not json")
+    cache = TranscriptCache(str(tmp_path))
+    assert cache.get("bad") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry_size = len('{"segments": [{"start": 0.0, "end": 1.5, "text": "hello"}]}')
+    cache = TranscriptCache(str(tmp_path), max_bytes=entry_size * 2)
+    cache.put("a", SEGMENTS)
+    cache.put("b", SEGMENTS)
+    # Make "a" the most recently used, then overflow
+    os.utime(tmp_path / "a.json", (2_000_000_000, 2_000_000_000))
+    os.utime(tmp_path / "b.json", (1_000_000_000, 1_000_000_000))
+    cache.put("c", SEGMENTS)
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_oversized_or_empty_entries_are_skipped(tmp_path):
+    cache = TranscriptCache(str(tmp_path), max_bytes=10)
+    cache.put("big", SEGMENTS)
+    cache.put("empty", [])
+    assert not any(tmp_path.iterdir())
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from whisper_pool import WhisperModelPool, WhisperPoolBusyError
+
+
+def make_pool(factory, size=2, **kwargs):
+    kwargs.setdefault("acquire_timeout_seconds", 0.2)
+    return WhisperModelPool(factory, size=size, total_cpu_threads=8, **kwargs)
+
+
+def test_models_get_an_equal_share_of_threads():
+    pool = make_pool(lambda threads: {"threads": threads}, size=2)
+    with pool.acquire() as model:
+        assert model == {"threads": 4}
+
+
+def test_acquire_reuses_loaded_models():
+    loads = []
+    pool = make_pool(lambda threads: loads.append(threads) or object(), size=2)
+    for _ in range(5):
+        with pool.acquire():
+            pass
+    assert len(loads) == 1
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["acquired"] == 5
+
+
+def test_acquire_times_out_when_all_models_are_held():
+    pool = make_pool(lambda threads: object(), size=1)
+    with pool.acquire():
+        with pytest.raises(WhisperPoolBusyError):
+            with pool.acquire():
+                pass
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_acquire_rejects_past_max_waiting():
+    pool = make_pool(lambda threads: object(), size=1, max_waiting=0)
+    with pool.acquire():
+        with pytest.raises(WhisperPoolBusyError):
+            with pool.acquire():
+                pass
+    assert pool.stats()["rejected"] == 1
+
+
+def test_failed_load_releases_its_slot():
+    fail = threading.Event()
+    fail.set()
+
+    def factory(threads):
+        if fail.is_set():
+            raise RuntimeError("model download failed")
+        return object()
+
+    pool = make_pool(factory, size=1)
+    with pytest.raises(RuntimeError):
+        with pool.acquire():
+            pass
+    fail.clear()
+    with pool.acquire() as model:
+        assert model is not None
+
+
+def test_failed_warm_up_releases_its_slots():
+    fail = threading.Event()
+    fail.set()
+
+    def factory(threads):
+        if fail.is_set():
+            raise RuntimeError("model download failed")
+        return object()
+
+    pool = make_pool(factory, size=2)
+    with pytest.raises(RuntimeError):
+        pool.warm_up()
+    fail.clear()
+    with pool.acquire(), pool.acquire():
+        assert pool.stats()["in_use"] == 2
+
+
+def test_warm_up_loads_every_model_and_runs_warm_fn():
+    warmed = []
+    pool = make_pool(lambda threads: object(), size=3)
+    pool.warm_up(warmed.append)
+    assert len(warmed) == 3
+    assert pool.stats()["loaded"] == 3